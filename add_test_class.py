@@ -40,9 +40,16 @@
 #     print(f"❌ Error sending test email: {e}")
 
 
+import os
 import sqlite3
+import sys
 
-DB_PATH = r"D:\trailnew\automated_reminder_system-main\database\reminders.db"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from storage import DEFAULT_DB_PATH
+
+# One hand-written class; benchmarks/loadgen.py generates whole institutions
+DB_PATH = os.getenv("DB_PATH", DEFAULT_DB_PATH)
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
 
@@ -0,0 +1,89 @@
+import argparse
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from dedup import DigestSet, digest
+
+# ============================================================
+# SYNTHETIC HISTORY
+# ============================================================
+# Keys look like the real ones: class-<session>-<date>-<m>-<email>.
+# sent_at is spread over `--days` so only the horizon is live.
+
+def populate(db_path, n, days):
+    now = int(time.time())
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE sent_reminders ("
+        "reminder_key TEXT PRIMARY KEY, reminder_digest INTEGER, sent_at INTEGER)"
+    )
+
+    def rows():
+        for i in range(n):
+            key = (
+                f"class-Design Thinking for Innovative Problem Solving #{i % 97}"
+                f"-2026-01-{i % 28 + 1:02d}-{(60, 30, 2)[i % 3]}-student{i}@gmail.com"
+            )
+            yield key, digest(key), now - (i * days * 86400) // n
+
+    with conn:
+        conn.executemany("INSERT INTO sent_reminders VALUES (?, ?, ?)", rows())
+    conn.execute("CREATE INDEX sent_reminders_sent_at_idx ON sent_reminders (sent_at)")
+    conn.close()
+
+# ============================================================
+# LOADERS (each run in its own process for a clean RSS reading)
+# ============================================================
+
+def load_set(conn, horizon):
+    return {k for (k,) in conn.execute("SELECT reminder_key FROM sent_reminders")}
+
+def load_digests(conn, horizon):
+    rows = conn.execute(
+        "SELECT reminder_digest, sent_at FROM sent_reminders WHERE sent_at >= ?",
+        (time.time() - horizon,)
+    )
+    return DigestSet.from_rows(rows, horizon=horizon)
+
+def measure(db_path, mode, horizon):
+    conn = sqlite3.connect(db_path)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    keys = (load_set if mode == "set" else load_digests)(conn, horizon)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:<8} {len(keys):>10} keys  startup {elapsed:6.2f}s  "
+          f"RSS +{(peak - base) / 1024:7.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup time and memory of the sent-key dedup store")
+    parser.add_argument("--keys", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365, help="history spread")
+    parser.add_argument("--horizon-days", type=int, default=7)
+    parser.add_argument("--measure", choices=["set", "digest"])
+    parser.add_argument("--db")
+    args = parser.parse_args()
+
+    horizon = args.horizon_days * 86400
+    if args.measure:
+        measure(args.db, args.measure, horizon)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sent.db")
+        started = time.perf_counter()
+        populate(db_path, args.keys, args.days)
+        print(f"populated {args.keys} keys in {time.perf_counter() - started:.1f}s")
+
+        for mode in ("set", "digest"):
+            subprocess.run([
+                sys.executable, __file__, "--measure", mode, "--db", db_path,
+                "--horizon-days", str(args.horizon_days),
+            ], check=True)
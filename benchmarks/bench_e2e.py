@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+import loadgen
+from discord_channels import ChannelResolver
+from fanout import EMAIL_CONCURRENCY, FanOut
+from metrics import REMINDERS, SCHEDULE_REFRESHES, STAGE_SECONDS
+from sent_store import PostgresSentStore, SQLiteSentStore
+from service import DiscordChannel, EmailChannel, ReminderService
+from sharding import Shard
+from smtp_pool import SMTPPool
+from smtp_stub import StubSMTPServer
+from storage import open_storage
+from templates import MimeLayout
+
+# ============================================================
+# END-TO-END REMINDER SERVICE BENCHMARK
+# ============================================================
+# Fills a store with a synthetic institution (loadgen.py), then runs
+# ReminderService.tick() over a simulated stretch of time - one tick
+# every --step seconds of event time, run back to back - with both
+# channels enabled: email goes to the local stub SMTP server and
+# Discord to an in-process fake client. Everything between the
+# database and the wire is the production code path.
+#
+# Reported: ticks/s, reminders delivered/s, p50/p99 tick latency and
+# peak RSS (of the whole process, stub servers included). Results are
+# written as JSON tagged with the git commit (benchmarks/results/ by
+# default); --baseline compares a run with an earlier file:
+#
+#   python benchmarks/bench_e2e.py --output before.json
+#   ... change something ...
+#   python benchmarks/bench_e2e.py --baseline before.json
+
+# Default home of the JSON results (git-ignored)
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+# Results compared by --baseline, and whether higher is better
+COMPARED = {
+    "ticks_per_second": True,
+    "reminders_per_second": True,
+    "tick_p50_ms": False,
+    "tick_p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+# Service state dropped before a run against an existing database
+STATE_TABLES = ("outbox", "scheduler_checkpoints", "sent_reminders")
+
+
+# ============================================================
+# STAND-INS
+# ============================================================
+
+class BenchEmailChannel(EmailChannel):
+    """EmailChannel pointed at the stub server, without rate limits."""
+
+    def __init__(self, port, concurrency, per_minute):
+        self.smtp_pool = SMTPPool("bench@local", "secret", host="127.0.0.1", port=port, use_ssl=False)
+        self.fan_out = FanOut(
+            self.smtp_pool.send, concurrency=concurrency,
+            max_per_minute=per_minute, domain_max_per_minute=per_minute,
+        )
+        self.layout = MimeLayout("bench@local")
+        self.shard = Shard()
+
+
+class FakeTextChannel:
+    def __init__(self, bot, channel_id):
+        self.bot = bot
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+
+    async def send(self, message):
+        await asyncio.sleep(self.bot.delay)
+        self.bot.messages += 1
+
+
+class FakeDiscordClient:
+    """Just what ChannelResolver and DiscordChannel.post use of discord.Client."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.messages = 0
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def fetch_channel(self, channel_id):
+        await asyncio.sleep(self.delay)
+        channel = self.channels[channel_id] = FakeTextChannel(self, channel_id)
+        return channel
+
+
+class FakeDiscordChannel(DiscordChannel):
+    def __init__(self, channel_ids, delay):
+        self.bot = FakeDiscordClient(delay)
+        self.resolver = ChannelResolver(self.bot, channel_ids)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def reset_state(storage):
+    conn = storage.connection()
+    try:
+        with conn:
+            for table in STATE_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+    finally:
+        conn.close()
+
+
+def open_sent_store(storage, journal_path):
+    if storage.dialect == "sqlite":
+        return SQLiteSentStore(storage.path, journal_path=journal_path)
+    return PostgresSentStore(pool=storage.pool, journal_path=journal_path)
+
+
+async def run_ticks(service, start, ticks, step):
+    service.sent = await asyncio.to_thread(service.store.load)
+    latencies = []
+    for i in range(ticks):
+        started = time.perf_counter()
+        await service.tick(now=start + i * step)
+        latencies.append(time.perf_counter() - started)
+    for channel in service.channels.values():
+        await channel.close()
+    await asyncio.to_thread(service.store.close)
+    return latencies
+
+
+def run(args, db, tmp):
+    storage = open_storage(db)
+    if args.db:
+        reset_state(storage)
+
+    start = time.time()
+    cohorts, counts = loadgen.generate(
+        storage, args.students, args.courses, args.batches, args.classes_per_day,
+        args.assignments, args.days, start=start, reset=bool(args.db),
+    )
+
+    smtp = StubSMTPServer(send_delay=args.smtp_ms / 1000).start()
+    email = BenchEmailChannel(smtp.port, args.email_concurrency, args.email_rate)
+    discord = FakeDiscordChannel(loadgen.channel_ids(cohorts), args.discord_ms / 1000)
+    service = ReminderService(storage, [email, discord])
+    service.store = open_sent_store(storage, os.path.join(tmp, "sent.wal"))
+
+    ticks = int(args.hours * 3600 // args.step)
+    started = time.perf_counter()
+    latencies = asyncio.run(run_ticks(service, start, ticks, args.step))
+    elapsed = time.perf_counter() - started
+    smtp.shutdown()
+    storage.close()
+
+    reminders = sum(REMINDERS.value(channel=channel, outcome="sent") for channel in ("email", "discord"))
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    stages = {
+        labels["stage"]: round(STAGE_SECONDS.value(**labels)[1], 3)
+        for labels in STAGE_SECONDS.series()
+        if labels["component"] == "service"
+    }
+    refreshes = {
+        labels["result"]: SCHEDULE_REFRESHES.value(**labels)
+        for labels in SCHEDULE_REFRESHES.series()
+        if labels["component"] == "service"
+    }
+    return {
+        "data": {"cohorts": len(cohorts), **counts},
+        "results": {
+            "ticks": ticks,
+            "seconds": round(elapsed, 3),
+            "ticks_per_second": round(ticks / elapsed, 2),
+            "reminders": reminders,
+            "reminders_per_second": round(reminders / elapsed, 1),
+            "emails": smtp.stats["messages"],
+            "discord_messages": discord.bot.messages,
+            "tick_p50_ms": round(quantiles[49] * 1000, 2),
+            "tick_p99_ms": round(quantiles[98] * 1000, 2),
+            "tick_max_ms": round(max(latencies) * 1000, 2),
+            "first_tick_ms": round(latencies[0] * 1000, 2),
+            "peak_rss_mb": peak_rss_mb(),
+            "stage_seconds": stages,
+            "schedule_refreshes": refreshes,
+        },
+    }
+
+
+def compare(report, baseline):
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('created_at')}):")
+    if baseline.get("args") != report["args"] or baseline.get("storage") != report["storage"]:
+        print("  note: the baseline ran with different arguments")
+    for name, higher_is_better in COMPARED.items():
+        old, new = baseline["results"].get(name), report["results"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        flag = "  (worse)" if worse and abs(change) >= 5 else ""
+        print(f"  {name:<22} {old:>10} -> {new:>10}  {change:+6.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reminder service ticks end to end against stub SMTP and Discord")
+    parser.add_argument("--db", help="scratch SQLite path or postgres:// URL (default: a temporary SQLite file); "
+                                     "its reminder data and service state are wiped")
+    loadgen.add_arguments(parser)
+    parser.add_argument("--hours", type=float, default=2, help="simulated time to run ticks over")
+    parser.add_argument("--step", type=int, default=60, help="simulated seconds between ticks")
+    parser.add_argument("--smtp-ms", type=float, default=0.0, help="stub SMTP latency per message")
+    parser.add_argument("--discord-ms", type=float, default=0.0, help="fake Discord latency per post")
+    parser.add_argument("--email-concurrency", type=int, default=EMAIL_CONCURRENCY)
+    parser.add_argument("--email-rate", type=int, default=0, help="emails per minute (0: unlimited)")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(args, args.db or os.path.join(tmp, "bench.db"), tmp)
+
+    commit = git_commit()
+    report = {
+        "benchmark": "e2e",
+        "commit": commit,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "storage": "postgres" if args.db and args.db.startswith(("postgres://", "postgresql://")) else "sqlite",
+        "args": {name: value for name, value in vars(args).items() if name not in ("output", "baseline", "db")},
+        **report,
+    }
+
+    data, results = report["data"], report["results"]
+    print(f"{data['cohorts']} cohorts, {data['students']} students, "
+          f"{data['classes']} classes, {data['assignments']} assignments")
+    print(f"{results['ticks']} ticks in {results['seconds']:.2f}s: "
+          f"{results['ticks_per_second']:.1f} ticks/s, {results['reminders_per_second']:.0f} reminders/s "
+          f"({results['reminders']} reminders, {results['emails']} emails, {results['discord_messages']} Discord posts)")
+    print(f"tick latency p50 {results['tick_p50_ms']:.1f} ms  p99 {results['tick_p99_ms']:.1f} ms  "
+          f"max {results['tick_max_ms']:.1f} ms  first {results['first_tick_ms']:.1f} ms")
+    print(f"peak RSS {results['peak_rss_mb']} MB")
+    print("schedule refreshes: " + ", ".join(
+        f"{count:g} {result}" for result, count in sorted(results["schedule_refreshes"].items())))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
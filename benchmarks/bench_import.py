@@ -0,0 +1,92 @@
+import argparse
+import contextlib
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import import_data
+
+COURSES = ["DSA", "FullStack", "CyberSecurity", "DataAnalytics", "CloudOps"]
+MODES = ["Online", "Offline"]
+
+# ============================================================
+# SYNTHETIC WORKBOOKS
+# ============================================================
+# Same sheet layout as the real exports in data/: students,
+# schedule and assignment, named Course_Batch_Year_Mode.xlsx.
+
+def make_workbook(path, seed, students, classes, assignments):
+    rng = random.Random(seed)
+    start = datetime.date(2026, 1, 5)
+    sheets = {
+        "students": pd.DataFrame({
+            "student_id": range(1, students + 1),
+            "name": [f"student{seed}-{i}" for i in range(students)],
+            "email": [f"student{seed}-{i}@test.local" for i in range(students)],
+            "discord_id": [rng.randrange(10**17, 10**18) for _ in range(students)],
+        }),
+        "schedule": pd.DataFrame({
+            "class_id": range(1, classes + 1),
+            "session_name": [f"Session {i}: topic {rng.randint(1, 500)}" for i in range(classes)],
+            "date": [pd.Timestamp(start + datetime.timedelta(days=i // 2)) for i in range(classes)],
+            "time": [datetime.time(rng.choice([10, 14, 16, 18]), rng.choice([0, 30])) for _ in range(classes)],
+        }),
+        "assignment": pd.DataFrame({
+            "assignment_id": range(1, assignments + 1),
+            "subject": [f"Assignment {i}" for i in range(assignments)],
+            "due_date": [pd.Timestamp(start + datetime.timedelta(days=7 * i)) for i in range(assignments)],
+        }),
+    }
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+def make_data_dir(data_dir, workbooks, students, classes, assignments):
+    for i in range(workbooks):
+        name = f"{COURSES[i % len(COURSES)]}_B{i}_2025_{MODES[i % 2]}.xlsx"
+        make_workbook(os.path.join(data_dir, name), i, students, classes, assignments)
+
+# ============================================================
+# RUN
+# ============================================================
+
+def run(data_dir, db_path, jobs):
+    import_data.DB_PATH = db_path
+    started = time.perf_counter()
+    import_data.import_all_courses(data_dir, jobs)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs process-pool workbook import")
+    parser.add_argument("--workbooks", type=int, default=300)
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--classes", type=int, default=60)
+    parser.add_argument("--assignments", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        os.mkdir(data_dir)
+        started = time.perf_counter()
+        make_data_dir(data_dir, args.workbooks, args.students, args.classes, args.assignments)
+        print(f"wrote {args.workbooks} workbooks in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for label, jobs in (("serial", 1), (f"jobs={args.jobs}", args.jobs)):
+                results[label] = run(data_dir, os.path.join(tmp, f"{label}.db"), jobs)
+
+            # a second pass over unchanged files only hashes them
+            results["unchanged"] = run(data_dir, os.path.join(tmp, "serial.db"), 1)
+
+        print(f"engine: {import_data.EXCEL_ENGINE}")
+        for label, elapsed in results.items():
+            print(f"{label:<10} {elapsed:7.2f}s  {args.workbooks / elapsed:8.1f} workbooks/s")
@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import loadgen
+from event_queries import PostgresEventQueries, SQLiteEventQueries
+from service import HORIZON_SPAN
+from storage import open_storage
+
+# ============================================================
+# RECIPIENT QUERY AT INSTITUTION SCALE
+# ============================================================
+# Times the students x events join behind
+# EventQueries.upcoming_recipients() - the query every email tick
+# runs - on a 50k-student institution with ~5k events (50 cohorts,
+# 80 classes and 20 assignments each). Each sample is one
+# HORIZON_SPAN window, as ReminderService loads them, stepped through
+# the whole event span.
+#
+#   python benchmarks/bench_recipients.py
+#   python benchmarks/bench_recipients.py --db postgresql://.../scratch
+
+def open_queries(storage):
+    if storage.dialect == "sqlite":
+        return SQLiteEventQueries(storage.path)
+    return PostgresEventQueries(storage.acquire)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def run(db, args):
+    storage = open_storage(db)
+    start = time.time()
+    cohorts, counts = loadgen.generate(
+        storage, args.students, args.courses, args.batches, args.classes_per_day,
+        args.assignments, args.days, start=start, reset=True,
+    )
+    conn = storage.connection()
+    try:
+        with conn:
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    print(f"{len(cohorts)} cohorts, {counts['students']} students, "
+          f"{counts['classes']} classes, {counts['assignments']} assignments")
+
+    queries = open_queries(storage)
+    end = start + args.days * 86400
+    for kind in ("class", "assign"):
+        latencies, recipients = [], 0
+        for at in range(int(start), int(end), args.window):
+            df, elapsed = timed(queries.upcoming_recipients, kind, at, at + args.window)
+            latencies.append(elapsed)
+            recipients += len(df)
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        print(f"{kind:<6} {len(latencies)} windows of {args.window}s: "
+              f"p50 {quantiles[49] * 1000:7.2f} ms  p99 {quantiles[98] * 1000:7.2f} ms  "
+              f"{recipients} recipients")
+
+    queries.close()
+    storage.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of the students x events recipient query")
+    parser.add_argument("--db", help="scratch SQLite path or postgres:// URL (default: a temporary SQLite file); "
+                                     "its students, classes and assignments are wiped")
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--batches", type=int, default=10, help="batches per course")
+    parser.add_argument("--classes-per-day", type=int, default=4, help="classes per cohort per day")
+    parser.add_argument("--assignments", type=int, default=20, help="assignments per cohort")
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument("--window", type=int, default=HORIZON_SPAN, help="seconds per query window")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(args.db or os.path.join(tmp, "bench.db"), args)
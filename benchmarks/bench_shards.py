@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from outbox import Outbox
+from sharding import Shard
+from storage import SQLiteStorage
+
+# ============================================================
+# SHARDED WORKERS AGAINST ONE SQLITE FILE
+# ============================================================
+# Every worker is a separate process that sees the full list of
+# due reminders, enqueues its shard's rows into the outbox and then
+# drains the outbox. With --replicas > 1 each shard runs on several
+# workers at once, so only the outbox (unique keys, leased batches)
+# keeps them from double-sending. Failed sends are retried with
+# backoff. The parent checks every key went out exactly once.
+
+def make_rows(recipients, reminders):
+    return [
+        {"student_email": f"student{i}@test.local", "key": f"class-Session {j}-2026-01-05-60-student{i}@test.local"}
+        for i in range(recipients)
+        for j in range(reminders)
+    ]
+
+def worker(db_path, index, shards, rows, batch, send_ms, fail_every):
+    storage = SQLiteStorage(db_path)
+    outbox = Outbox(storage, worker=f"worker-{os.getpid()}", backoff_base=0.01, backoff_max=0.05)
+    shard = Shard(index, shards)
+    deadline = time.time() + 3600
+    outbox.enqueue("email", [
+        (row["key"], row["student_email"], {}, deadline) for row in rows if shard.owns(row)
+    ])
+
+    delivered, failures, attempts = [], 0, 0
+    while True:
+        leased = outbox.dequeue("email", batch)
+        if not leased:
+            if not outbox.depth():
+                break
+            time.sleep(0.01)
+            continue
+        sent = []
+        for row in leased:
+            attempts += 1
+            time.sleep(send_ms / 1000)
+            if fail_every and attempts % fail_every == 0:
+                outbox.fail([row], "injected failure")
+                failures += 1
+            else:
+                sent.append(row)
+        outbox.ack(sent)
+        delivered.extend(row["job_key"] for row in sent)
+    storage.close()
+    return delivered, failures
+
+def run(db_path, shards, replicas, rows, batch, send_ms, fail_every):
+    Outbox(SQLiteStorage(db_path)).create_table()
+    tasks = [
+        (db_path, index, shards, rows, batch, send_ms, fail_every)
+        for index in range(shards)
+        for _ in range(replicas)
+    ]
+    started = time.perf_counter()
+    with multiprocessing.Pool(len(tasks)) as pool:
+        results = pool.starmap(worker, tasks)
+    return time.perf_counter() - started, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exactly-once delivery across sharded worker processes")
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--reminders", type=int, default=3)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--replicas", type=int, default=2, help="workers per shard")
+    parser.add_argument("--batch", type=int, default=200, help="rows leased per dequeue")
+    parser.add_argument("--send-ms", type=float, default=0.0, help="simulated send latency")
+    parser.add_argument("--fail-every", type=int, default=50, help="fail every Nth send (0: never)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.recipients, args.reminders)
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed, results = run(
+            os.path.join(tmp, "outbox.db"), args.shards, args.replicas, rows,
+            args.batch, args.send_ms, args.fail_every,
+        )
+
+    counts = Counter(key for delivered, _ in results for key in delivered)
+    duplicates = sum(1 for n in counts.values() if n > 1)
+    missing = len(rows) - len(counts)
+    failures = sum(f for _, f in results)
+
+    print(f"workers: {args.shards} shards x {args.replicas} replicas")
+    for i, (delivered, failed) in enumerate(results):
+        print(f"  worker {i:>2} (shard {i // args.replicas}): {len(delivered):>6} sent, {failed} failed+retried")
+    print(f"{len(rows)} keys in {elapsed:.2f}s ({len(rows) / elapsed:.0f}/s)")
+    print(f"duplicates: {duplicates}  missing: {missing}  failed sends retried: {failures}")
+    if duplicates or missing:
+        raise SystemExit(1)
@@ -0,0 +1,59 @@
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from smtp_pool import SMTPPool, build_message
+from smtp_stub import StubSMTPServer
+
+# ============================================================
+# BEFORE: ONE CONNECTION + LOGIN PER MESSAGE
+# ============================================================
+
+def send_unpooled(port, messages):
+    for recipient, subject, body in messages:
+        msg = build_message("bench@local", recipient, subject, body)
+        with smtplib.SMTP("127.0.0.1", port, timeout=30) as server:
+            server.login("bench@local", "secret")
+            server.send_message(msg)
+
+# ============================================================
+# AFTER: POOLED SESSIONS + send_batch
+# ============================================================
+
+def send_pooled(port, messages):
+    pool = SMTPPool("bench@local", "secret", host="127.0.0.1", port=port, use_ssl=False)
+    results = pool.send_batch(messages)
+    pool.close()
+    failed = [r for r in results if not r.ok]
+    if failed:
+        raise RuntimeError(f"{len(failed)} messages failed: {failed[0].error}")
+
+def run(label, fn, port, messages):
+    started = time.perf_counter()
+    fn(port, messages)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {len(messages):>6} msgs  {elapsed:7.2f}s  {len(messages) / elapsed:8.1f} msg/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-message SMTP logins with the pooled sender")
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--handshake-ms", type=float, default=40.0,
+                        help="simulated TLS handshake + login latency")
+    args = parser.parse_args()
+
+    server = StubSMTPServer(handshake_delay=args.handshake_ms / 1000).start()
+    messages = [
+        (f"student{i}@test.local", "Class Reminder: Bench", f"Hi student {i},\n\nBenchmark body.")
+        for i in range(args.messages)
+    ]
+
+    try:
+        run("before", send_unpooled, server.port, messages)
+        run("after", send_pooled, server.port, messages)
+        print("server stats:", server.stats)
+    finally:
+        server.stop()
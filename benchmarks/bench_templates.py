@@ -0,0 +1,100 @@
+import argparse
+import email
+import email.policy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import reminder_messages
+from reminder_messages import build_job, email_item, prepare_job
+from smtp_pool import build_message
+from templates import MimeLayout
+
+SENDER = "reminders@test.local"
+
+# ============================================================
+# SYNTHETIC RECIPIENTS
+# ============================================================
+# `--events` classes, each with `--per-event` students - the shape
+# of a real tick, where every student of a cohort gets the same
+# section and only the greeting and address differ.
+
+def make_rows(events, per_event):
+    return [
+        (
+            {"session_name": f"Session {e}: Graph Algorithms", "date": "2026-01-05",
+             "course": "DSA", "batch_name": f"B{e % 7}", "mode": "Online"},
+            {"name": f"Student {e}-{i}", "email": f"student{e}-{i}@test.local"},
+        )
+        for e in range(events)
+        for i in range(per_event)
+    ]
+
+# ============================================================
+# BEFORE: F-STRINGS + EMAIL.MIME PER RECIPIENT
+# ============================================================
+
+def item_fstring(row, m, stu):
+    return (
+        f"class-{row['session_name']}-{row['date']}-{m}-{stu['email']}",
+        f"Class Reminder: {row['session_name']}",
+        f"📘 Upcoming Class Reminder\n\n"
+        f"📌 Topic : {row['session_name']}\n"
+        f"📚 Course: {row['course']}\n"
+        f"👥 Batch : {row['batch_name']} ({row['mode']})\n"
+        f"🕒 Starts in {m} minutes"
+    )
+
+def render_before(rows):
+    for row, stu in rows:
+        _, recipient, subject, body = build_job(stu, [item_fstring(row, 30, stu)])
+        build_message(SENDER, recipient, subject, body).as_bytes()
+
+# ============================================================
+# AFTER: COMPILED TEMPLATES + PRE-ENCODED MIME
+# ============================================================
+
+def render_after(rows, layout):
+    for row, stu in rows:
+        prepare_job(layout, stu, [email_item("class", row, 30, stu)])
+
+def check(rows, layout):
+    """The pre-encoded message must carry the same text the old path sent."""
+    row, stu = rows[-1]
+    _, _, subject, body = build_job(stu, [item_fstring(row, 30, stu)])
+    _, message = prepare_job(layout, stu, [email_item("class", row, 30, stu)])
+    parsed = email.message_from_bytes(message.data, policy=email.policy.default)
+    text = parsed.get_body(("plain",)).get_content().replace("\r\n", "\n")
+    assert parsed["Subject"] == subject and parsed["To"] == stu["email"], parsed
+    assert text.rstrip("\n") == body, text
+    if layout.html:
+        assert stu["name"] in parsed.get_body(("html",)).get_content()
+
+def run(label, fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-recipient MIME building vs compiled templates")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--per-event", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = make_rows(args.events, args.per_event)
+    plain, both = MimeLayout(SENDER, html=False), MimeLayout(SENDER, html=True)
+    check(rows, plain)
+    check(rows, both)
+
+    results = [
+        ("before", run("before", render_before, rows)),
+        ("after", run("after", render_after, rows, plain)),
+    ]
+    reminder_messages._class_text.cache_clear()
+    results.append(("after+html", run("after+html", render_after, rows, both)))
+
+    print(f"{len(rows)} messages ({args.events} events x {args.per_event} recipients)")
+    for label, elapsed in results:
+        print(f"{label:<11} {elapsed:7.2f}s  {len(rows) / elapsed:10.0f} msg/s")
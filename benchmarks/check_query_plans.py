@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import loadgen
+from event_queries import SQLiteEventQueries
+from migrations import PLANNED_QUERIES, check_query_plans, full_scans, query_plan, schema_drift
+from storage import SQLiteStorage
+
+# ============================================================
+# QUERY-PLAN REGRESSION CHECK
+# ============================================================
+# Builds a database with the migrations, fills it with a synthetic
+# institution (loadgen.py), runs ANALYZE and asserts that
+#
+#   - the migrated tables and indexes match storage.SCHEMA/INDEXES
+#     (what Postgres is built from),
+#   - every lookup in migrations.PLANNED_QUERIES uses its index, and
+#   - the windowed queries the notifiers run every reload
+#     (event_queries.SQLiteEventQueries), with and without a cohort
+#     filter, never scan a whole table.
+#
+# Exits 1 and prints the offending plans otherwise, so it can gate CI:
+#
+#   python benchmarks/check_query_plans.py
+
+def event_queries(db_path, cohort):
+    """(name, sql, params) for every windowed query shape the notifiers run."""
+    queries = SQLiteEventQueries(db_path)
+    try:
+        for kind in ("class", "assign"):
+            for cohorts, label in ((None, ""), ([cohort], ", one cohort")):
+                yield (f"upcoming {kind}{label}", *queries.upcoming_query(kind, 0, 4500, cohorts))
+                yield (f"recipients {kind}{label}", *queries.upcoming_recipients_query(kind, 0, 4500, cohorts))
+    finally:
+        queries.close()
+
+
+def run(db_path, students):
+    storage = SQLiteStorage(db_path)
+    cohorts, _ = loadgen.generate(storage, students=students)
+    storage.close()
+
+    conn = SQLiteStorage(db_path).dedicated()
+    conn.execute("ANALYZE")
+    drift = schema_drift(conn)
+    failures = [(name, plan, "misses its index") for name, plan in check_query_plans(conn)]
+    course, batch, year, _ = cohorts[0]
+    checked = list(event_queries(db_path, (course, batch, str(year))))
+    for name, sql, params in checked:
+        plan = query_plan(conn, sql, params)
+        if full_scans(plan):
+            failures.append((name, plan, "scans a table"))
+    conn.close()
+    return len(PLANNED_QUERIES) + len(checked), drift, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail when a hot query's plan regresses to a full scan")
+    parser.add_argument("--students", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checked, drift, failures = run(os.path.join(tmp, "plans.db"), args.students)
+
+    for problem in drift:
+        print(f"FAIL schema: {problem}")
+    for name, plan, problem in failures:
+        print(f"FAIL {name}: {problem}")
+        for step in plan:
+            print(f"    {step}")
+    print(f"{checked - len(failures)}/{checked} query plans OK")
+    if drift or failures:
+        raise SystemExit(1)
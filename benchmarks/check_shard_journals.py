@@ -0,0 +1,89 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+from smtp_stub import StubSMTPServer
+
+# ============================================================
+# SIDE-BY-SIDE SHARD WORKERS
+# ============================================================
+# Starts --shards mail_scheduler.py workers at once, sharded on the
+# command line (--shard i --shards n) rather than through
+# EMAIL_SHARD / EMAIL_SHARDS, in one working directory, against the
+# given Postgres database and the local stub SMTP server. Each worker
+# must lock its own sent journal (sent_email_reminders.<i>-of-<n>.wal)
+# and still be running after --settle seconds; a worker that finds its
+# journal locked by another exits, and the check fails with its output:
+#
+#   python benchmarks/check_shard_journals.py --db postgresql://.../scratch
+
+def worker_env(db, smtp_port):
+    env = {
+        name: value for name, value in os.environ.items()
+        if name not in ("EMAIL_SHARD", "EMAIL_SHARDS", "SENT_JOURNAL_PATH")
+    }
+    env.update({
+        "DATABASE_URL": db,
+        "SENDER_EMAIL": "check@local",
+        "SENDER_PASS": "secret",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USE_SSL": "0",
+    })
+    return env
+
+
+def run(db, shards, settle, cwd):
+    smtp = StubSMTPServer().start()
+    env = worker_env(db, smtp.port)
+    script = os.path.join(BASE_DIR, "scripts", "mail_scheduler.py")
+    workers = [
+        subprocess.Popen(
+            [sys.executable, script, "--shard", str(i), "--shards", str(shards)],
+            cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        for i in range(shards)
+    ]
+    locks = [os.path.join(cwd, f"sent_email_reminders.{i}-of-{shards}.wal.lock") for i in range(shards)]
+
+    deadline = time.time() + settle
+    while time.time() < deadline and all(worker.poll() is None for worker in workers):
+        time.sleep(0.2)
+
+    failures = []
+    for i, (worker, lock) in enumerate(zip(workers, locks)):
+        if worker.poll() is not None:
+            failures.append((i, f"exited with {worker.returncode}", worker.stdout.read()))
+        elif not os.path.exists(lock):
+            failures.append((i, f"never locked {os.path.basename(lock)}", ""))
+    for worker in workers:
+        if worker.poll() is None:
+            worker.terminate()
+        worker.communicate()
+    smtp.shutdown()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run sharded email workers side by side and check their journals")
+    parser.add_argument("--db", required=True, help="postgres:// URL of a scratch database")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--settle", type=float, default=10, help="seconds every worker must stay up")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = run(args.db, args.shards, args.settle, tmp)
+
+    for index, problem, output in failures:
+        print(f"FAIL shard {index}: {problem}")
+        for line in output.splitlines()[-10:]:
+            print(f"    {line}")
+    print(f"{args.shards - len(failures)}/{args.shards} shard workers running on their own journals")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,144 @@
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from discord_channels import CHANNEL_YEAR, channel_env_key
+from storage import open_storage
+
+COURSES = ["DSA", "FullStack", "CyberSecurity", "DataAnalytics", "CloudOps"]
+MODES = ["Online", "Offline"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "college.edu"]
+
+IST = pytz.timezone("Asia/Kolkata")
+
+# ============================================================
+# SYNTHETIC INSTITUTION
+# ============================================================
+# Writes students, classes and assignments straight into a store
+# (SQLite path or postgres:// URL, see storage.open_storage) in the
+# shape the importer produces: one cohort per course x batch, all in
+# the current intake year, students spread evenly across cohorts.
+#
+# Events are spaced evenly through each day starting at `start`,
+# with cohorts offset from one another, rather than bunched into
+# teaching hours: a short benchmark run then sees the same steady
+# load whatever the time of day it is started at.
+
+def course_name(i):
+    name = COURSES[i % len(COURSES)]
+    return name if i < len(COURSES) else f"{name}{i // len(COURSES) + 1}"
+
+
+def make_cohorts(courses, batches):
+    """(course, batch_name, year, mode) per cohort; modes alternate by batch."""
+    return [
+        (course_name(c), f"B{b + 1}", int(CHANNEL_YEAR), MODES[b % len(MODES)])
+        for c in range(courses)
+        for b in range(batches)
+    ]
+
+
+def local_time(epoch):
+    return datetime.datetime.fromtimestamp(epoch, IST)
+
+
+def make_rows(cohorts, students, classes_per_day, assignments, days, start):
+    start = int(start // 60 * 60)
+    span = days * 86400
+
+    student_rows = [
+        (f"Student {i}", f"student{i}@{DOMAINS[i % len(DOMAINS)]}", *cohorts[i % len(cohorts)])
+        for i in range(students)
+    ]
+
+    class_rows, assignment_rows = [], []
+    for n, cohort in enumerate(cohorts):
+        phase = n / len(cohorts)
+        for j in range(days * classes_per_day):
+            at = start + int((j + phase) * 86400 / classes_per_day) // 60 * 60
+            local = local_time(at)
+            class_rows.append((
+                *cohort, f"Session {j + 1}", local.strftime("%Y-%m-%d"), local.strftime("%H:%M"), at,
+            ))
+        for j in range(assignments):
+            at = start + int((j + 0.5 + phase) * span / assignments) // 60 * 60
+            assignment_rows.append((
+                *cohort, f"Assignment {j + 1}", local_time(at).strftime("%Y-%m-%d %H.%M"), at,
+            ))
+    return student_rows, class_rows, assignment_rows
+
+
+def generate(storage, students=2000, courses=5, batches=4, classes_per_day=4,
+             assignments=10, days=1, start=None, reset=False):
+    """Populate `storage`; returns the cohorts and row counts per table."""
+    start = time.time() if start is None else start
+    cohorts = make_cohorts(courses, batches)
+    student_rows, class_rows, assignment_rows = make_rows(
+        cohorts, students, classes_per_day, assignments, days, start,
+    )
+
+    storage.ensure_schema()
+    conn = storage.connection()
+    try:
+        with conn:
+            if reset:
+                for table in ("students", "classes", "assignments"):
+                    conn.execute(f"DELETE FROM {table}")
+            conn.executemany(
+                "INSERT INTO students (name, email, course, batch_name, year, mode) "
+                "VALUES (?, ?, ?, ?, ?, ?)", student_rows,
+            )
+            conn.executemany(
+                "INSERT INTO classes (course, batch_name, year, mode, session_name, date, time, starts_at_utc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", class_rows,
+            )
+            conn.executemany(
+                "INSERT INTO assignments (course, batch_name, year, mode, subject, due_date, starts_at_utc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", assignment_rows,
+            )
+    finally:
+        conn.close()
+
+    return cohorts, {
+        "students": len(student_rows), "classes": len(class_rows), "assignments": len(assignment_rows),
+    }
+
+
+def channel_ids(cohorts):
+    """DISCORD_<COURSE>_<BATCH>_<YEAR>_<MODE> -> a made-up channel id per cohort."""
+    return {
+        channel_env_key({"course": course, "batch_name": batch, "year": year, "mode": mode}): 1000 + n
+        for n, (course, batch, year, mode) in enumerate(cohorts)
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--batches", type=int, default=4, help="batches per course")
+    parser.add_argument("--classes-per-day", type=int, default=4, help="classes per cohort per day")
+    parser.add_argument("--assignments", type=int, default=10, help="assignments per cohort")
+    parser.add_argument("--days", type=int, default=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a reminders database with a synthetic institution")
+    # No default: pointing this at the real database has to be deliberate
+    parser.add_argument("--db", required=True, help="SQLite path or postgres:// URL")
+    parser.add_argument("--reset", action="store_true", help="delete existing students, classes and assignments")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    storage = open_storage(args.db)
+    cohorts, counts = generate(
+        storage, args.students, args.courses, args.batches, args.classes_per_day,
+        args.assignments, args.days, reset=args.reset,
+    )
+    storage.close()
+    print(f"{len(cohorts)} cohorts: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
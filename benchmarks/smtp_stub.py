@@ -0,0 +1,83 @@
+import socketserver
+import threading
+import time
+
+# ============================================================
+# LOCAL STAND-IN SMTP SERVER
+# ============================================================
+# Speaks just enough SMTP for smtplib (EHLO, AUTH, MAIL, RCPT,
+# DATA, NOOP, RSET, QUIT). `handshake_delay` emulates the cost of
+# a TLS handshake + login so pooled and unpooled senders can be
+# compared without hitting a real mail server.
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        time.sleep(server.handshake_delay)
+        self.reply("220 stub ESMTP ready")
+        server.count("connections")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors="replace").strip()
+            verb = cmd.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-stub")
+                self.reply("250-8BITMIME")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                time.sleep(server.handshake_delay)
+                server.count("logins")
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET"):
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                time.sleep(server.send_delay)
+                server.count("messages")
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, handshake_delay=0.0, send_delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.handshake_delay = handshake_delay
+        self.send_delay = send_delay
+        self.stats = {"connections": 0, "logins": 0, "messages": 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
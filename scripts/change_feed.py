@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import select
+import socket
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from db_cache import VERSIONED_TABLES, PostgresTableCache, SQLiteTableCache
+
+log = logging.getLogger("reminders.changes")
+
+# ============================================================
+# CHANGE NOTIFICATIONS FROM THE IMPORTER
+# ============================================================
+# After a commit the importer publishes the cohorts it touched -
+# (course, batch_name, year), the unit it replaces - and the table
+# versions it left behind; the notifiers wake up at once and reload
+# just those cohorts, so they no longer need a short poll interval
+# (their version probe stays as a slow safety net).
+#
+#   Postgres : NOTIFY reminder_changes, '<json>'
+#   SQLite   : a datagram to every subscriber's Unix socket in
+#              <db>.notify/ (subscribers bind <pid>.sock there)
+#
+# The message also carries the table versions from before and after
+# the import. If the subscriber's schedule was built at the "before"
+# versions and it now probes the "after" ones, the importer's cohorts
+# explain every change and a partial reload is enough; otherwise
+# (someone else wrote too, or a message was missed) it reloads
+# everything.
+# Without Unix sockets (Windows) the SQLite feed is a no-op and the
+# notifiers fall back to polling.
+
+CHANNEL = "reminder_changes"
+
+# Postgres caps NOTIFY payloads at 8000 bytes; past this the message
+# asks for a full reload instead of listing cohorts
+MAX_PAYLOAD = 7000
+
+Change = namedtuple("Change", ["cohorts", "before", "after"])
+
+
+def cohort_key(course, batch_name, year):
+    """Comparable cohort identity (the notifiers normalise some columns)."""
+    return str(course).strip().lower(), str(batch_name).strip().upper(), str(year).strip()
+
+
+def row_cohort(row):
+    return cohort_key(row["course"], row["batch_name"], row["year"])
+
+
+def encode_change(cohorts, before, after):
+    cohorts = sorted({tuple(str(v) for v in cohort) for cohort in cohorts})
+    payload = json.dumps({"cohorts": cohorts, "before": before, "after": after})
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps({"cohorts": None, "before": before, "after": after})
+    return payload
+
+
+def decode_change(payload):
+    """Change(cohorts=[(course, batch_name, year)] or None for "everything", before, after)."""
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return Change(None, None, None)
+    cohorts = data.get("cohorts")
+    return Change(
+        None if cohorts is None else [tuple(c) for c in cohorts],
+        data.get("before") or None,
+        data.get("after") or None,
+    )
+
+
+def merge_changes(changes):
+    """One Change covering several notifications in arrival order.
+
+    The cohorts add up only while each import starts where the previous
+    one ended; a gap means some other write happened in between.
+    """
+    if not changes:
+        return None
+    cohorts = set()
+    for previous, change in zip([None] + changes, changes):
+        if cohorts is None or change.cohorts is None:
+            cohorts = None
+        elif previous is not None and previous.after != change.before:
+            cohorts = None
+        else:
+            cohorts |= set(change.cohorts)
+    return Change(None if cohorts is None else sorted(cohorts), changes[0].before, changes[-1].after)
+
+
+def reload_cohorts(change, loaded, current):
+    """Cohorts to reload after `change`, or None to reload everything.
+
+    `loaded` are the table versions the schedule was built from and
+    `current` the ones probed now.
+    """
+    if change is None or change.cohorts is None:
+        return None
+    if change.before != loaded or change.after != current:
+        return None
+    return change.cohorts
+
+
+# ============================================================
+# SUBSCRIPTIONS
+# ============================================================
+# Each one exposes fileno() for select()/loop.add_reader() plus:
+#   drain()       -> [Change] received so far (non-blocking)
+#   wait(timeout) -> [Change], blocking up to `timeout` seconds
+
+class Subscription(ABC):
+    # False when changes can only be noticed by polling
+    live = True
+
+    @abstractmethod
+    def fileno(self):
+        ...
+
+    @abstractmethod
+    def drain(self):
+        ...
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self], [], [], max(0, timeout))
+        return self.drain() if ready else []
+
+    def close(self):
+        pass
+
+
+class SocketSubscription(Subscription):
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def drain(self):
+        changes = []
+        while True:
+            try:
+                payload = self.sock.recv(65536)
+            except BlockingIOError:
+                return changes
+            changes.append(decode_change(payload.decode("utf-8")))
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class PostgresSubscription(Subscription):
+    def __init__(self, database_url):
+        import psycopg2
+
+        self.conn = psycopg2.connect(database_url)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def drain(self):
+        self.conn.poll()
+        changes = [decode_change(n.payload) for n in self.conn.notifies]
+        self.conn.notifies.clear()
+        return changes
+
+    def close(self):
+        self.conn.close()
+
+
+class NullSubscription(Subscription):
+    """No notifications: wait() just sleeps, so callers keep polling."""
+
+    live = False
+
+    def fileno(self):
+        return None
+
+    def drain(self):
+        return []
+
+    def wait(self, timeout):
+        import time
+
+        time.sleep(max(0, timeout))
+        return []
+
+
+# ============================================================
+# FEEDS
+# ============================================================
+# versions() -> {table: version token}, as JSON-ready values
+# publish(cohorts, before) -> number of subscribers reached
+# subscribe() -> Subscription
+
+class SQLiteChangeFeed:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.directory = f"{db_path}.notify"
+
+    def versions(self):
+        cache = SQLiteTableCache(self.db_path)
+        try:
+            return {table: cache.version(table) for table in VERSIONED_TABLES}
+        finally:
+            cache.close()
+
+    def publish(self, cohorts, before):
+        if not hasattr(socket, "AF_UNIX") or not os.path.isdir(self.directory):
+            return 0
+        payload = encode_change(cohorts, before, self.versions()).encode("utf-8")
+        sent = 0
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    sock.sendto(payload, path)
+                    sent += 1
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # subscriber exited without cleaning up
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                except OSError as e:
+                    log.warning("Change notification failed", extra={"subscriber": name, "error": e})
+        return sent
+
+    def subscribe(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return NullSubscription()
+        return SocketSubscription(self.directory)
+
+
+class PostgresChangeFeed:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def versions(self):
+        raw = self.storage.acquire()
+        cache = PostgresTableCache(lambda: raw)
+        try:
+            return {table: cache.version(table) for table in VERSIONED_TABLES}
+        finally:
+            raw.autocommit = False
+            self.storage.release(raw)
+
+    def publish(self, cohorts, before):
+        payload = encode_change(cohorts, before, self.versions())
+        conn = self.storage.connection()
+        try:
+            with conn:
+                conn.execute("SELECT pg_notify(?, ?)", (CHANNEL, payload))
+        finally:
+            conn.close()
+        return 1
+
+    def subscribe(self):
+        return PostgresSubscription(self.storage.database_url)
+
+
+def open_feed(storage):
+    if storage.dialect == "postgres":
+        return PostgresChangeFeed(storage)
+    return SQLiteChangeFeed(storage.path)
@@ -0,0 +1,66 @@
+import os
+import time
+
+from storage import column_type
+
+# ============================================================
+# LAST PROCESSED INSTANT
+# ============================================================
+# Each scheduler records the instant its last tick covered. After a
+# restart (or a tick that took longer than a reminder window) it
+# resumes from there instead of from "now": every reminder that
+# fired in between is looked at again, delivered if it is still
+# relevant and counted as expired otherwise (see
+# ReminderScheduler.due).
+#
+# Workers that share a name (replicas of one shard) share the
+# checkpoint; it only ever moves forward.
+
+# Downtime longer than this is not caught up on
+CATCHUP_MAX_HOURS = float(os.getenv("CATCHUP_MAX_HOURS", "24"))
+
+
+class Checkpoint:
+    def __init__(self, storage, name, max_age=CATCHUP_MAX_HOURS * 3600):
+        self.storage = storage
+        self.name = name
+        self.max_age = max_age
+        self._created = False
+
+    def _run(self, fn):
+        conn = self.storage.connection()
+        try:
+            with conn:
+                return fn(conn)
+        finally:
+            conn.close()
+
+    def create_table(self):
+        if self._created:
+            return
+        epoch = column_type("epoch", self.storage.dialect)
+        self._run(lambda conn: conn.execute(
+            "CREATE TABLE IF NOT EXISTS scheduler_checkpoints ("
+            f"name TEXT PRIMARY KEY, processed_at {epoch} NOT NULL)"
+        ))
+        self._created = True
+
+    def load(self, now=None):
+        """Instant to resume from, or None on a first run (or after very long downtime)."""
+        self.create_table()
+        now = time.time() if now is None else now
+        row = self._run(lambda conn: conn.execute(
+            "SELECT processed_at FROM scheduler_checkpoints WHERE name = ?", (self.name,)
+        ).fetchone())
+        if row is None or row[0] < now - self.max_age:
+            return None
+        return min(row[0], now)
+
+    def save(self, processed_at):
+        self.create_table()
+        self._run(lambda conn: conn.execute(
+            "INSERT INTO scheduler_checkpoints (name, processed_at) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET processed_at = excluded.processed_at "
+            "WHERE excluded.processed_at > scheduler_checkpoints.processed_at",
+            (self.name, int(processed_at)),
+        ))
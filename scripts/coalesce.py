@@ -0,0 +1,43 @@
+import os
+from collections import OrderedDict
+
+# ============================================================
+# MESSAGE COALESCING
+# ============================================================
+# Reminders due within the same grouping window for the same
+# target (a Discord channel or an email address) are merged into
+# one digest message instead of one message per event.
+
+# Reminders firing up to this many seconds ahead are pulled into
+# the current tick so they can share a digest
+DIGEST_WINDOW_SECONDS = int(os.getenv("DIGEST_WINDOW_SECONDS", "60"))
+
+# Discord rejects messages longer than this
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+def coalesce(items, target):
+    """Group items by target(item), keeping first-seen order. Returns [(target, [items])]."""
+    groups = OrderedDict()
+    for item in items:
+        groups.setdefault(target(item), []).append(item)
+    return list(groups.items())
+
+
+def pack(parts, limit=DISCORD_MESSAGE_LIMIT, separator="\n\n"):
+    """Split (text, payload) parts into messages of at most `limit` characters.
+
+    Returns [(message_text, [payloads])].
+    """
+    messages = []
+    text, payloads = "", []
+    for part, payload in parts:
+        candidate = part if not text else text + separator + part
+        if text and len(candidate) > limit:
+            messages.append((text, payloads))
+            text, payloads = part, [payload]
+        else:
+            text, payloads = candidate, payloads + [payload]
+    if text:
+        messages.append((text, payloads))
+    return messages
@@ -1,68 +1,23 @@
-import sqlite3
-import pandas as pd
 import os
 
+from storage import DEFAULT_DB_PATH, open_storage
+
 # -------------------------------------------------
-# DATABASE PATH (PORTABLE & SAFE)
+# DATABASE (PORTABLE & SAFE)
 # -------------------------------------------------
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_DIR = os.path.join(BASE_DIR, "database")
-DB_PATH = os.path.join(DB_DIR, "reminders.db")
+# May also be a postgres:// URL
+DB_PATH = os.getenv("DB_PATH", DEFAULT_DB_PATH)
 
-def connect_db():
-    # Ensure database directory exists
-    os.makedirs(DB_DIR, exist_ok=True)
-    return sqlite3.connect(DB_PATH)
+def get_storage():
+    return open_storage(DB_PATH)
 
 # -------------------------------------------------
 # DATABASE TABLE CREATION
 # -------------------------------------------------
 
 def create_tables():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        discord_id TEXT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        mode TEXT
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS classes (
-        class_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        session_name TEXT NOT NULL,
-        date TEXT NOT NULL,
-        time TEXT NOT NULL,
-        mode TEXT
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS assignments (
-        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        subject TEXT NOT NULL,
-        due_date TEXT NOT NULL,
-        mode TEXT
-    );
-    """)
-
-    conn.commit()
-    conn.close()
+    get_storage().ensure_schema()
     print("✅ Tables verified or created successfully.")
 
 # -------------------------------------------------
@@ -70,18 +25,16 @@ def create_tables():
 # -------------------------------------------------
 
 def view_all():
-    conn = connect_db()
+    storage = get_storage()
 
     print("\n=== Students Table ===")
-    print(pd.read_sql_query("SELECT * FROM students", conn))
+    print(storage.read_frame("SELECT * FROM students"))
 
     print("\n=== Classes Table ===")
-    print(pd.read_sql_query("SELECT * FROM classes", conn))
+    print(storage.read_frame("SELECT * FROM classes"))
 
     print("\n=== Assignments Table ===")
-    print(pd.read_sql_query("SELECT * FROM assignments", conn))
-
-    conn.close()
+    print(storage.read_frame("SELECT * FROM assignments"))
 
 def view_by_course():
     course = input("Enter course name (e.g., DSA, CyberSecurity, FullStack): ").strip()
@@ -89,32 +42,34 @@ def view_by_course():
     year = input("Enter year (optional, e.g., 2024 or 2025): ").strip()
     mode = input("Enter mode (Online/Offline, optional): ").strip()
 
-    query = f"SELECT * FROM students WHERE course = '{course}'"
+    where = "course = ?"
+    params = [course]
 
     if batch_name:
-        query += f" AND batch_name = '{batch_name}'"
+        where += " AND batch_name = ?"
+        params.append(batch_name)
 
     if year:
         if year.isdigit():
-            query += f" AND year = {year}"
+            where += " AND year = ?"
+            params.append(int(year))
         else:
             print("⚠️ Invalid year entered. Year must be numeric. Ignoring year filter.")
 
     if mode:
-        query += f" AND mode = '{mode}'"
+        where += " AND mode = ?"
+        params.append(mode)
 
-    conn = connect_db()
+    storage = get_storage()
 
     print(f"\n=== Students Enrolled in {course} ===")
-    print(pd.read_sql_query(query, conn))
+    print(storage.read_frame(f"SELECT * FROM students WHERE {where}", params))
 
     print(f"\n=== Classes for {course} ===")
-    print(pd.read_sql_query(query.replace("students", "classes"), conn))
+    print(storage.read_frame(f"SELECT * FROM classes WHERE {where}", params))
 
     print(f"\n=== Assignments for {course} ===")
-    print(pd.read_sql_query(query.replace("students", "assignments"), conn))
-
-    conn.close()
+    print(storage.read_frame(f"SELECT * FROM assignments WHERE {where}", params))
 
 # -------------------------------------------------
 # MENU
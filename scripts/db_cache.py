@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# ============================================================
+# TABLE VERSION PROBES
+# ============================================================
+# A cheap per-table version token. The notifiers reload their
+# schedule (through windowed queries, see event_queries.py) only
+# when a token they depend on moves.
+#
+#   SQLite   : PRAGMA data_version gates everything (it only moves
+#              when another connection commits); per-table versions
+#              come from the trigger-maintained `table_versions`.
+#   Postgres : the same `table_versions` row per table, bumped by a
+#              statement-level trigger; a probe is one primary-key
+#              lookup however large the table grows.
+
+VERSIONED_TABLES = ("students", "classes", "assignments")
+
+
+def install_version_triggers(conn, tables=VERSIONED_TABLES):
+    """Create `table_versions` and the SQLite triggers that bump it."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    for table in tables:
+        conn.execute(
+            "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+            (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END;
+            """)
+
+
+# Statement-level, so a bulk import bumps the version once per statement
+PG_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def install_postgres_version_triggers(conn, tables=VERSIONED_TABLES):
+    """Create `table_versions` and the Postgres triggers that bump it.
+
+    Run inside a transaction on a psycopg2 connection; the advisory lock
+    keeps workers starting together from creating the triggers twice.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('table_versions'))")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        """)
+        cur.execute(
+            "INSERT INTO table_versions (table_name, version) "
+            "SELECT unnest(%s::text[]), 0 ON CONFLICT (table_name) DO NOTHING",
+            (list(tables),)
+        )
+        names = {f"{table}_version_bump": table for table in tables}
+        cur.execute("SELECT tgname FROM pg_trigger WHERE tgname = ANY(%s)", (list(names),))
+        existing = {row[0] for row in cur.fetchall()}
+        missing = [table for name, table in names.items() if name not in existing]
+        if missing:
+            cur.execute(PG_VERSION_FUNCTION)
+        for table in missing:
+            cur.execute(
+                f"CREATE TRIGGER {table}_version_bump "
+                f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                "FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()"
+            )
+
+
+class TableCache(ABC):
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _probe(self, table):
+        ...
+
+    def version(self, table):
+        """Current version token for `table` (probes the database)."""
+        with self._lock:
+            return self._probe(table)
+
+
+# ============================================================
+# SQLITE
+# ============================================================
+
+class SQLiteTableCache(TableCache):
+    def __init__(self, db_path):
+        super().__init__()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            install_version_triggers(self.conn)
+        self._data_version = None
+        self._table_versions = {}
+
+    def _probe(self, table):
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._table_versions = dict(
+                self.conn.execute("SELECT table_name, version FROM table_versions")
+            )
+        return self._table_versions.get(table)
+
+    def close(self):
+        self.conn.close()
+
+
+# ============================================================
+# POSTGRESQL
+# ============================================================
+
+class PostgresTableCache(TableCache):
+    def __init__(self, connect):
+        super().__init__()
+        self._connect = connect
+        self.conn = None
+        self._installed = False
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self._connect()
+            if not self._installed:
+                with self.conn:
+                    install_postgres_version_triggers(self.conn)
+                self._installed = True
+            self.conn.autocommit = True
+        return self.conn
+
+    def _probe(self, table):
+        with self._connection().cursor() as cur:
+            cur.execute("SELECT version FROM table_versions WHERE table_name = %s", (table,))
+            row = cur.fetchone()
+            return None if row is None else row[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+# ============================================================
+# COMPACT DEDUP SET FOR SENT REMINDER KEYS
+# ============================================================
+# Reminder keys are long f-strings; holding every one ever sent in
+# a Python set costs well over 100 bytes per key. Each key is stored
+# alongside a 64-bit digest (first 8 bytes of its MD5, which Postgres
+# can also compute in SQL), so startup reads plain integers. Digests
+# live in per-day buckets - a sorted numpy array for bulk-loaded ones
+# plus a small set for keys added since - and buckets older than the
+# horizon are dropped.
+#
+# With 10M live keys the chance of any 64-bit collision is ~3e-6;
+# a collision only suppresses a duplicate-looking reminder.
+
+SENT_HORIZON_DAYS = int(os.getenv("SENT_HORIZON_DAYS", "7"))
+BUCKET_SECONDS = 86400
+
+# Fold a bucket's recent set into its sorted array past this size
+MERGE_AT = 50_000
+
+# Rows are pulled in chunks of this size when bulk loading
+LOAD_CHUNK = 100_000
+
+# Same value as digest(), for backfilling rows in Postgres
+PG_DIGEST_SQL = "('x' || substr(md5(reminder_key), 1, 16))::bit(64)::bigint"
+
+
+def digest(key):
+    """Signed 64-bit digest of a reminder key (fits SQLite INTEGER / Postgres BIGINT)."""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big", signed=True)
+
+
+class _Bucket:
+    __slots__ = ("sorted", "recent")
+
+    def __init__(self, digests=None):
+        if digests is None:
+            self.sorted = np.empty(0, dtype=np.int64)
+        else:
+            self.sorted = np.unique(np.asarray(digests, dtype=np.int64))
+        self.recent = set()
+
+    def __contains__(self, d):
+        if d in self.recent:
+            return True
+        i = np.searchsorted(self.sorted, d)
+        return i < len(self.sorted) and self.sorted[i] == d
+
+    def __len__(self):
+        return len(self.sorted) + len(self.recent)
+
+    def add(self, d):
+        self.recent.add(d)
+        if len(self.recent) >= MERGE_AT:
+            merged = np.fromiter(self.recent, dtype=np.int64, count=len(self.recent))
+            self.sorted = np.union1d(self.sorted, merged)
+            self.recent = set()
+
+    @property
+    def nbytes(self):
+        # ~ 60 bytes per int in a set (entry + boxed int)
+        return self.sorted.nbytes + 60 * len(self.recent)
+
+
+class DigestSet:
+    def __init__(self, horizon=SENT_HORIZON_DAYS * 86400):
+        self.horizon = horizon
+        self.buckets = {}
+
+    @staticmethod
+    def _bucket_id(ts):
+        return int(ts // BUCKET_SECONDS)
+
+    @classmethod
+    def from_rows(cls, rows, now=None, horizon=SENT_HORIZON_DAYS * 86400):
+        """Build from an iterable of integer (digest, sent_at_epoch) rows within the horizon."""
+        now = time.time() if now is None else now
+        oldest = now - horizon
+        staging = {}
+        rows = iter(rows)
+        while True:
+            chunk = np.array(list(islice(rows, LOAD_CHUNK)), dtype=np.int64).reshape(-1, 2)
+            if not len(chunk):
+                break
+            chunk = chunk[chunk[:, 1] >= oldest]
+            bucket_ids = chunk[:, 1] // BUCKET_SECONDS
+            for bucket_id in np.unique(bucket_ids):
+                staging.setdefault(int(bucket_id), []).append(chunk[bucket_ids == bucket_id, 0])
+
+        digests = cls(horizon)
+        for bucket_id, parts in staging.items():
+            digests.buckets[bucket_id] = _Bucket(np.concatenate(parts))
+        return digests
+
+    def __contains__(self, key):
+        d = digest(key)
+        return any(d in bucket for bucket in self.buckets.values())
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def add(self, key, sent_at=None):
+        sent_at = time.time() if sent_at is None else sent_at
+        bucket_id = self._bucket_id(sent_at)
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            bucket = self.buckets[bucket_id] = _Bucket()
+        bucket.add(digest(key))
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        oldest = self._bucket_id(now - self.horizon)
+        for bucket_id in [b for b in self.buckets if b < oldest]:
+            del self.buckets[bucket_id]
+
+    @property
+    def nbytes(self):
+        return sum(bucket.nbytes for bucket in self.buckets.values())
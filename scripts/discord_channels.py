@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import time
+
+from metrics import SEND_SECONDS
+
+log = logging.getLogger("reminders.discord")
+
+# ============================================================
+# CHANNEL RESOLVER
+# ============================================================
+# The DISCORD_<COURSE>_<BATCH>_<YEAR>_<MODE> -> channel id map is
+# read from the environment once. Channel objects are cached and
+# taken from the gateway cache (bot.get_channel) when possible, so
+# fetch_channel() - a REST call - only happens on a cold miss.
+
+# Reminders only go to the current intake
+CHANNEL_YEAR = "2025"
+
+
+def channel_env_key(row):
+    year = str(row.get("year", "")).strip()
+    if CHANNEL_YEAR not in year:
+        return None
+
+    course = str(row.get("course", "")).strip()
+    batch = str(row.get("batch_name", "")).strip()
+    mode = str(row.get("mode", "")).strip()
+
+    key = "_".join([course, batch, year, mode]).upper().replace(" ", "_")
+    return f"DISCORD_{key}"
+
+
+def load_channel_ids(environ=None):
+    environ = os.environ if environ is None else environ
+    ids = {}
+    for name, value in environ.items():
+        if not name.startswith("DISCORD_") or name == "DISCORD_TOKEN":
+            continue
+        try:
+            ids[name] = int(value)
+        except ValueError:
+            continue
+    return ids
+
+
+class ChannelResolver:
+    def __init__(self, bot, channel_ids=None):
+        self.bot = bot
+        self.channel_ids = load_channel_ids() if channel_ids is None else channel_ids
+        self.channels = {}
+        self.rest_calls = 0
+        self._missing = set()
+
+    def channel_id(self, row):
+        env_key = channel_env_key(row)
+        if env_key is None:
+            return None
+
+        channel_id = self.channel_ids.get(env_key)
+        if channel_id is None and env_key not in self._missing:
+            self._missing.add(env_key)
+            log.error("Missing Discord channel env", extra={"env": env_key})
+        return channel_id
+
+    async def resolve(self, row):
+        channel_id = self.channel_id(row)
+        if channel_id is None:
+            return None
+        return await self.by_id(channel_id)
+
+    async def by_id(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel is not None:
+            return channel
+
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            self.rest_calls += 1
+            try:
+                channel = await self.bot.fetch_channel(channel_id)
+            except Exception as e:
+                log.warning("Channel fetch failed", extra={"channel_id": channel_id, "error": e})
+                return None
+
+        self.channels[channel_id] = channel
+        return channel
+
+
+# ============================================================
+# CONCURRENT DISPATCH
+# ============================================================
+
+async def dispatch(sends, send, concurrency=None):
+    """Run send(channel, message) for each (channel, message); return bool results.
+
+    discord.py already waits out 429s per route; the semaphore keeps
+    the number of requests in flight small enough not to trigger them.
+    """
+    if concurrency is None:
+        concurrency = int(os.getenv("DISCORD_CONCURRENCY", "5"))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(channel, message):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return await send(channel, message)
+            finally:
+                SEND_SECONDS.observe(time.perf_counter() - started, channel="discord")
+
+    return await asyncio.gather(*(run(channel, message) for channel, message in sends))
+
+
+# ============================================================
+# SSL PATCH
+# ============================================================
+
+def disable_ssl_verification():
+    """Give aiohttp sessions created without a connector a non-verifying SSL context."""
+    import ssl
+
+    import aiohttp
+
+    original_init = aiohttp.ClientSession.__init__
+
+    def patched_init(self, *args, **kwargs):
+        if "connector" not in kwargs:
+            ctx = ssl.create_default_context()
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+            kwargs["connector"] = aiohttp.TCPConnector(ssl=ctx)
+        return original_init(self, *args, **kwargs)
+
+    aiohttp.ClientSession.__init__ = patched_init
@@ -1,14 +1,27 @@
 import os
 import asyncio
-import sqlite3
-import pandas as pd
+import logging
 from datetime import datetime
 import discord
 from dotenv import load_dotenv
-import ssl
-import aiohttp
 import pytz
 
+from change_feed import SQLiteChangeFeed, cohort_key, merge_changes, reload_cohorts, row_cohort
+from coalesce import DIGEST_WINDOW_SECONDS, coalesce, pack
+from db_cache import VERSIONED_TABLES, SQLiteTableCache
+from discord_channels import ChannelResolver, disable_ssl_verification, dispatch
+from event_queries import SQLiteEventQueries
+from event_times import TIMESTAMP_COLUMN
+from logs import configure_logging
+from metrics import REMINDERS, SCHEDULE_REFRESHES, SCHEDULED, STAGE_SECONDS, TICK_SECONDS, start_exporter
+from reminder_messages import (
+    ASSIGNMENT_WINDOWS, CLASS_WINDOWS, DIGEST_SEPARATOR, discord_key, discord_text,
+)
+from checkpoint import Checkpoint
+from reminder_scheduler import ReminderScheduler
+from sent_store import DISCORD_SENT_LOG_PATH, AppendOnlySentLog
+from storage import open_storage
+
 # ============================================================
 # LOAD ENV
 # ============================================================
@@ -22,6 +35,8 @@ if not TOKEN:
 if not DB_PATH or not os.path.exists(DB_PATH):
     raise ValueError("❌ DB_PATH invalid or missing")
 
+log = logging.getLogger("reminders.discord")
+
 # ============================================================
 # TIMEZONE
 # ============================================================
@@ -30,20 +45,9 @@ IST = pytz.timezone("Asia/Kolkata")
 # ============================================================
 # SENT LOG
 # ============================================================
-SENT_LOG_PATH = "sent_discord_reminders.log"
-
-def load_sent():
-    if os.path.exists(SENT_LOG_PATH):
-        with open(SENT_LOG_PATH) as f:
-            return set(line.strip() for line in f)
-    return set()
-
-def save_sent(sent):
-    with open(SENT_LOG_PATH, "w") as f:
-        for k in sorted(sent):
-            f.write(k + "\n")
+SENT_LOG_PATH = DISCORD_SENT_LOG_PATH
 
-sent_reminders = load_sent()
+sent_reminders = AppendOnlySentLog(SENT_LOG_PATH).load(datetime.now(IST).timestamp())
 
 # ============================================================
 # DISCORD BOT
@@ -54,45 +58,23 @@ bot = discord.Client(intents=intents)
 # ============================================================
 # DATABASE HELPERS
 # ============================================================
-def fetch_df(query):
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+# Upgrades older databases in place (indexes the windowed queries rely on)
+open_storage(DB_PATH).ensure_schema()
 
-def get_classes():
-    return fetch_df("SELECT * FROM classes")
+# Version probes only: rows come from windowed queries
+table_cache = SQLiteTableCache(DB_PATH)
+event_queries = SQLiteEventQueries(DB_PATH)
 
-def get_assignments():
-    return fetch_df("SELECT * FROM assignments")
+def get_classes(start, end, cohorts=None):
+    return event_queries.upcoming("class", start, end, cohorts)
+
+def get_assignments(start, end, cohorts=None):
+    return event_queries.upcoming("assign", start, end, cohorts)
 
 # ============================================================
 # CHANNEL RESOLVER
 # ============================================================
-async def get_channel_for_row(row):
-    year = str(row.get("year", "")).strip()
-    if "2025" not in year:
-        return None
-
-    course = str(row.get("course", "")).strip()
-    batch = str(row.get("batch_name", "")).strip()
-    mode = str(row.get("mode", "")).strip()
-
-    key = "_".join([course, batch, year, mode]).upper().replace(" ", "_")
-    env_key = f"DISCORD_{key}"
-
-    channel_id = os.getenv(env_key)
-    print("DEBUG CHANNEL KEY:", env_key, "→", channel_id)
-
-    if not channel_id:
-        print("❌ Missing ENV:", env_key)
-        return None
-
-    try:
-        return await bot.fetch_channel(int(channel_id))
-    except Exception as e:
-        print("❌ Channel fetch failed:", e)
-        return None
+channel_resolver = ChannelResolver(bot)
 
 # ============================================================
 # SEND MESSAGE
@@ -100,122 +82,206 @@ async def get_channel_for_row(row):
 async def send_message(channel, message):
     try:
         await channel.send(message)
-        print(f"✅ Sent to #{channel.name}")
+        log.debug("Discord message sent", extra={"channel": channel.name})
+        return True
     except Exception as e:
-        print("❌ Discord send error:", e)
+        log.warning("Discord send failed", extra={"channel": channel.name, "error": e})
+        return False
+
+# ============================================================
+# REMINDER SCHEDULE
+# ============================================================
+# The importer announces each import on the change feed (see
+# change_feed.py) and only the touched cohorts are reloaded. Probing
+# table versions is the fallback wake-up, with and without the feed
+RELOAD_INTERVAL = int(os.getenv("RELOAD_INTERVAL", "300"))
+POLL_INTERVAL = 15
+
+# Delay before a failed channel fetch or send is tried again
+RETRY_DELAY = 15
+
+# Only events whose reminders can fire within the next couple of
+# spans are loaded; the schedule is reloaded every span
+HORIZON_SPAN = 600
+
+scheduler = ReminderScheduler({"class": CLASS_WINDOWS, "assign": ASSIGNMENT_WINDOWS})
+
+# Last processed instant; a restart catches up on what fired while down
+checkpoint = Checkpoint(open_storage(DB_PATH), "discord")
+
+feed = SQLiteChangeFeed(DB_PATH)
+subscription = None
+
+def load_events(start, end, cohorts=None):
+    with STAGE_SECONDS.time(component="discord", stage="query"):
+        frames = [("class", get_classes(start, end, cohorts)), ("assign", get_assignments(start, end, cohorts))]
+    events = []
+    with STAGE_SECONDS.time(component="discord", stage="parse"):
+        for kind, df in frames:
+            for row in df[df[TIMESTAMP_COLUMN].notna()].to_dict("records"):
+                events.append((kind, int(row[TIMESTAMP_COLUMN]), row))
+    return events
+
+def refresh_schedule(now_ts, change=None):
+    bucket, start, end = scheduler.horizon(now_ts, HORIZON_SPAN)
+    with STAGE_SECONDS.time(component="discord", stage="probe"):
+        versions = {table: table_cache.version(table) for table in VERSIONED_TABLES}
+    signature = (bucket, versions)
+    if not scheduler.needs_reload(signature):
+        SCHEDULE_REFRESHES.inc(component="discord", result="unchanged")
+        return
+
+    # Only the imported cohorts when nothing else changed since the last load
+    cohorts = None
+    if scheduler.signature is not None and scheduler.signature[0] == bucket:
+        cohorts = reload_cohorts(change, scheduler.signature[1], versions)
+
+    events = load_events(start, end, cohorts)
+    with STAGE_SECONDS.time(component="discord", stage="schedule"):
+        if cohorts is None:
+            scheduler.load(events, signature, now_ts)
+        else:
+            changed = {cohort_key(*cohort) for cohort in cohorts}
+            scheduler.replace(lambda event: row_cohort(event) in changed, events, signature, now_ts)
+    SCHEDULED.set(len(scheduler), component="discord")
+    SCHEDULE_REFRESHES.inc(component="discord", result="reloaded" if cohorts is None else "cohorts")
+
+    if cohorts is None:
+        log.info("Schedule loaded", extra={"reminders": len(scheduler), "rows": len(events)})
+    else:
+        log.info("Cohorts reloaded", extra={
+            "cohorts": len(changed), "rows": len(events), "reminders": len(scheduler),
+        })
+
+def format_reminder(reminder):
+    return discord_text(reminder.kind, reminder.tag, reminder.event)
+
+def reminder_key(reminder, channel):
+    return discord_key(reminder.kind, reminder.tag, reminder.event, channel.id)
 
 # ============================================================
 # REMINDER LOOP
 # ============================================================
+async def tick(change=None):
+    now_ts = datetime.now(IST).timestamp()
+    refresh_schedule(now_ts, change)
+
+    rest_calls = channel_resolver.rest_calls
+    pending = []
+    due = scheduler.due(now_ts, lookahead=DIGEST_WINDOW_SECONDS)
+    dropped = scheduler.dropped
+    REMINDERS.inc(len(due), channel="discord", outcome="due")
+    REMINDERS.inc(dropped["stale"], channel="discord", outcome="expired")
+    REMINDERS.inc(dropped["superseded"], channel="discord", outcome="superseded")
+    if dropped["stale"] or dropped["superseded"]:
+        log.info("Dropped reminders", extra={"expired": dropped["stale"], "superseded": dropped["superseded"]})
+    for reminder in due:
+        channel_id = channel_resolver.channel_id(reminder.event)
+        if channel_id is None:
+            # no channel mapped for this cohort (logged once by the resolver)
+            REMINDERS.inc(channel="discord", outcome="skipped")
+            continue
+        channel = await channel_resolver.by_id(channel_id)
+        if not channel:
+            # mapped, but the fetch failed: try again later
+            REMINDERS.inc(channel="discord", outcome="retried")
+            scheduler.retry(reminder, now_ts + RETRY_DELAY)
+            continue
+
+        key = reminder_key(reminder, channel)
+        if key in sent_reminders:
+            REMINDERS.inc(channel="discord", outcome="skipped")
+            continue
+        pending.append((reminder, key, channel))
+
+    # One digest per channel, split to fit Discord's message limit
+    messages = []
+    for _, group in coalesce(pending, lambda p: p[2].id):
+        channel = group[0][2]
+        parts = [(format_reminder(reminder), (reminder, key)) for reminder, key, _ in group]
+        for text, payloads in pack(parts, separator=DIGEST_SEPARATOR):
+            messages.append((channel, text, payloads))
+
+    with STAGE_SECONDS.time(component="discord", stage="send_discord"):
+        results = await dispatch([(channel, text) for channel, text, _ in messages], send_message)
+    for (_, _, payloads), ok in zip(messages, results):
+        REMINDERS.inc(len(payloads), channel="discord", outcome="sent" if ok else "failed")
+        for reminder, key in payloads:
+            if ok:
+                sent_reminders.add(key, reminder.event_at)
+            else:
+                scheduler.retry(reminder, now_ts + RETRY_DELAY)
+
+    checkpoint.save(now_ts)
+    if messages:
+        sent_reminders.compact_if_needed(now_ts)
+        log.info("Discord messages sent", extra={
+            "sent": sum(results), "messages": len(messages), "reminders": len(pending),
+            "rest_calls": channel_resolver.rest_calls - rest_calls,
+        })
+
+def seconds_until_next_tick():
+    interval = RELOAD_INTERVAL if subscription.live else POLL_INTERVAL
+    wait = scheduler.seconds_until_next(datetime.now(IST).timestamp())
+    return interval if wait is None else max(1, min(interval, wait))
+
+async def wait_for_change(timeout):
+    """Sleep up to `timeout` seconds, waking early on a change notification."""
+    fd = subscription.fileno()
+    if fd is None:
+        await asyncio.sleep(timeout)
+        return None
+
+    loop = asyncio.get_running_loop()
+    notified = asyncio.Event()
+    loop.add_reader(fd, notified.set)
+    try:
+        await asyncio.wait_for(notified.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        loop.remove_reader(fd)
+    return merge_changes(subscription.drain())
+
 async def reminder_loop():
+    global subscription
     await bot.wait_until_ready()
-    print("🔁 Discord Reminder System Started")
-
-    while not bot.is_closed():
-        now = datetime.now(IST)
-
-        # ================= CLASS REMINDERS =================
-        for _, row in get_classes().iterrows():
-            channel = await get_channel_for_row(row)
-            if not channel:
-                continue
-
-            class_dt = pd.to_datetime(
-                f"{row['date']} {row['time']}",
-                errors="coerce"
-            )
-            if pd.isna(class_dt):
-                continue
-
-            # ✅ FIX: DB time is already IST (do NOT localize again)
-            class_dt = class_dt.replace(tzinfo=IST)
-
-            minutes_left = (class_dt - now).total_seconds() / 60
-
-            reminders = [
-                (45, 75, "60", "⏰ **Class Reminder (1 Hour Left)**"),
-                (20, 40, "30", "⏰ **Class Reminder (30 Minutes Left)**"),
-                (0, 5,  "2",  "🚀 **Class Starting Soon**"),
-            ]
-
-            for lo, hi, tag, title in reminders:
-                if not (lo <= minutes_left <= hi):
-                    continue
-
-                key = f"class-{tag}-{row['session_name']}-{row['date']}-{channel.id}"
-                if key in sent_reminders:
-                    continue
-
-                await send_message(
-                    channel,
-                    f"{title}\n\n"
-                    f"📘 {row['session_name']}\n"
-                    f"📚 {row['course']}\n"
-                    f"👥 {row['batch_name']} {row['year']} ({row['mode']})\n"
-                    f"🕒 Starts at {row['time']}"
-                )
-                sent_reminders.add(key)
-
-        # ================= ASSIGNMENT REMINDERS =================
-        for _, row in get_assignments().iterrows():
-            channel = await get_channel_for_row(row)
-            if not channel:
-                continue
-
-            due_dt = pd.to_datetime(row["due_date"], errors="coerce")
-            if pd.isna(due_dt):
-                continue
-
-            # ✅ SAME FIX HERE
-            due_dt = due_dt.replace(tzinfo=IST)
-
-            minutes_left = (due_dt - now).total_seconds() / 60
-
-            for m in (60, 30, 15):
-                if not (m - 10 <= minutes_left <= m + 10):
-                    continue
-
-                key = f"assign-{row['subject']}-{row['due_date']}-{m}-{channel.id}"
-                if key in sent_reminders:
-                    continue
-
-                await send_message(
-                    channel,
-                    f"📝 **Assignment Reminder**\n\n"
-                    f"📌 {row['subject']}\n"
-                    f"📚 {row['course']}\n"
-                    f"👥 {row['batch_name']} {row['year']} ({row['mode']})\n"
-                    f"⏳ {m} minutes remaining"
-                )
-                sent_reminders.add(key)
-
-        save_sent(sent_reminders)
-        await asyncio.sleep(15)
+    log.info("Discord reminder system started")
+    scheduler.processed_at = checkpoint.load()
+    if scheduler.processed_at is not None:
+        log.info("Catching up", extra={
+            "since": f"{datetime.fromtimestamp(scheduler.processed_at, IST):%Y-%m-%d %H:%M:%S} IST",
+        })
+    # Subscribed before the first load so no import is missed in between
+    subscription = feed.subscribe()
+
+    try:
+        change = None
+        while not bot.is_closed():
+            with TICK_SECONDS.time(component="discord"):
+                await tick(change)
+            change = await wait_for_change(seconds_until_next_tick())
+    finally:
+        subscription.close()
 
 # ============================================================
 # SSL PATCH
 # ============================================================
-original_init = aiohttp.ClientSession.__init__
-def patched_init(self, *args, **kwargs):
-    if "connector" not in kwargs:
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-        kwargs["connector"] = aiohttp.TCPConnector(ssl=ctx)
-    return original_init(self, *args, **kwargs)
-
-aiohttp.ClientSession.__init__ = patched_init
+disable_ssl_verification()
 
 # ============================================================
 # RUN
 # ============================================================
 @bot.event
 async def on_ready():
-    print(f"🤖 Logged in as {bot.user}")
+    log.info("Discord logged in", extra={"user": str(bot.user)})
 
 async def main():
     async with bot:
         asyncio.create_task(reminder_loop())
         await bot.start(TOKEN)
 
-asyncio.run(main())
+if __name__ == "__main__":
+    configure_logging()
+    start_exporter()
+    asyncio.run(main())
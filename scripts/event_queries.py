@@ -0,0 +1,239 @@
+import sqlite3
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+from event_times import DEFAULT_DUE_TIME, TIMESTAMP_COLUMN, TIMEZONE, with_timestamps
+
+# ============================================================
+# WINDOWED EVENT QUERIES
+# ============================================================
+# Instead of reading whole tables and filtering by time in Python,
+# the notifiers ask the database only for events starting within
+# [start, end) - the span whose reminders can fire before the next
+# reload - optionally already joined to their current-year students.
+#
+#   SQLite   : filters on the indexed starts_at_utc column; rows the
+#              importer has not stamped yet are matched on the time
+#              computed from date/time (IST has no DST, so a fixed
+#              offset is exact).
+#   Postgres : the same, the fallback computing the start in SQL from
+#              the text columns behind regex guards. Tables created
+#              before starts_at_utc existed (PostgresStorage.
+#              ensure_schema adds it) are matched on the computed
+#              start alone.
+
+EVENT_TABLES = {"class": "classes", "assign": "assignments"}
+
+# Reminders only go to the current intake
+RECIPIENT_YEAR = "2025"
+
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+
+STUDENT_COLUMNS = "s.name AS student_name, s.email AS student_email"
+
+# A cohort is what the importer replaces as a unit (see import_data.sync_rows)
+COHORT_COLUMNS = "(e.course, e.batch_name, CAST(e.year AS TEXT))"
+
+
+def cohort_filter(cohorts, placeholder):
+    """SQL restricting events to (course, batch_name, year) cohorts, and its params.
+
+    `placeholder` turns a parameter name into the driver's syntax.
+    """
+    if cohorts is None:
+        return "", {}
+    params, rows = {}, []
+    for i, cohort in enumerate(cohorts):
+        names = [f"cohort{i}_{j}" for j in range(3)]
+        params.update(zip(names, (str(value) for value in cohort)))
+        rows.append("(" + ", ".join(placeholder(name) for name in names) + ")")
+    if not rows:
+        return " AND 0 = 1", {}
+    return f" AND {COHORT_COLUMNS} IN (VALUES {', '.join(rows)})", params
+
+
+class EventQueries(ABC):
+    # --- backend hooks -------------------------------------------------
+
+    @abstractmethod
+    def _upcoming(self, kind, start, end, cohorts):
+        ...
+
+    @abstractmethod
+    def _upcoming_recipients(self, kind, start, end, cohorts):
+        ...
+
+    # --- public API ------------------------------------------------------
+
+    def upcoming(self, kind, start, end, cohorts=None):
+        """Events of `kind` starting in [start, end), with starts_at_utc filled in.
+
+        `cohorts` limits the result to those (course, batch_name, year) cohorts.
+        """
+        return self._upcoming(kind, start, end, cohorts)
+
+    def upcoming_recipients(self, kind, start, end, cohorts=None):
+        """Like upcoming(), one row per (event, current-year student): adds student_name, student_email."""
+        return self._upcoming_recipients(kind, start, end, cohorts)
+
+
+# ============================================================
+# SQLITE
+# ============================================================
+
+SQLITE_LOCAL_START = {
+    "class": "strftime('%s', e.date || ' ' || e.time)",
+    "assign": (
+        "strftime('%s', CASE WHEN length(e.due_date) <= 10 "
+        f"THEN e.due_date || ' {DEFAULT_DUE_TIME}' "
+        "ELSE replace(e.due_date, '.', ':') END)"
+    ),
+}
+
+
+class SQLiteEventQueries(EventQueries):
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def _window(self, kind):
+        computed = f"(CAST({SQLITE_LOCAL_START[kind]} AS INTEGER) - {IST_OFFSET_SECONDS})"
+        return (
+            f"((e.{TIMESTAMP_COLUMN} >= :start AND e.{TIMESTAMP_COLUMN} < :end) OR "
+            f"(e.{TIMESTAMP_COLUMN} IS NULL AND {computed} >= :start AND {computed} < :end))"
+        )
+
+    def upcoming_query(self, kind, start, end, cohorts=None):
+        """(sql, params) of _upcoming; also used to check its query plan."""
+        where, params = cohort_filter(cohorts, lambda name: f":{name}")
+        sql = f"SELECT e.* FROM {EVENT_TABLES[kind]} e WHERE {self._window(kind)}{where}"
+        return sql, {"start": start, "end": end, **params}
+
+    def upcoming_recipients_query(self, kind, start, end, cohorts=None):
+        """(sql, params) of _upcoming_recipients; also used to check its query plan."""
+        # Matched case- and whitespace-insensitively, as on Postgres; the
+        # student side is served by students_cohort_norm_idx
+        where, params = cohort_filter(cohorts, lambda name: f":{name}")
+        sql = (
+            f"SELECT e.*, {STUDENT_COLUMNS} FROM {EVENT_TABLES[kind]} e "
+            "CROSS JOIN students s "
+            "ON lower(trim(s.course)) = lower(trim(e.course)) "
+            "AND upper(trim(s.batch_name)) = upper(trim(e.batch_name)) "
+            "AND s.year = :year "
+            "AND lower(trim(s.mode)) = lower(trim(coalesce(e.mode, 'offline'))) "
+            f"WHERE {self._window(kind)}{where}"
+        )
+        return sql, {"start": start, "end": end, "year": int(RECIPIENT_YEAR), **params}
+
+    def _upcoming(self, kind, start, end, cohorts):
+        sql, params = self.upcoming_query(kind, start, end, cohorts)
+        return with_timestamps(pd.read_sql_query(sql, self.conn, params=params), kind)
+
+    def _upcoming_recipients(self, kind, start, end, cohorts):
+        sql, params = self.upcoming_recipients_query(kind, start, end, cohorts)
+        return with_timestamps(pd.read_sql_query(sql, self.conn, params=params), kind)
+
+    def close(self):
+        self.conn.close()
+
+
+# ============================================================
+# POSTGRESQL
+# ============================================================
+
+def _pg_local_start(kind):
+    if kind == "class":
+        text = "(e.date::text || ' ' || e.time::text)"
+        guard = (
+            r"e.date::text ~ '^\d{4}-\d{2}-\d{2}$' AND "
+            r"e.time::text ~ '^\d{1,2}:\d{2}(:\d{2})?$'"
+        )
+    else:
+        due = "replace(trim(e.due_date::text), '.', ':')"
+        text = f"(CASE WHEN length({due}) <= 10 THEN {due} || ' {DEFAULT_DUE_TIME}' ELSE {due} END)"
+        guard = rf"{text} ~ '^\d{{4}}-\d{{2}}-\d{{2}} \d{{1,2}}:\d{{2}}$'"
+    return (
+        f"CASE WHEN {guard} THEN extract(epoch FROM "
+        f"({text}::timestamp AT TIME ZONE '{TIMEZONE}'))::bigint END"
+    )
+
+
+class PostgresEventQueries(EventQueries):
+    def __init__(self, connect):
+        self._connect = connect
+        self.conn = None
+        self._column_types = {}
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self._connect()
+            self.conn.autocommit = True
+        return self.conn
+
+    def _column_type(self, table, column):
+        """information_schema data_type of table.column, None if it does not exist."""
+        if (table, column) not in self._column_types:
+            with self._connection().cursor() as cur:
+                cur.execute(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_name = %s AND column_name = %s",
+                    (table, column)
+                )
+                row = cur.fetchone()
+                self._column_types[table, column] = row[0] if row else None
+        return self._column_types[table, column]
+
+    def _events(self, kind, cohorts=None):
+        table = EVENT_TABLES[kind]
+        computed = _pg_local_start(kind)
+        if self._column_type(table, TIMESTAMP_COLUMN) is not None:
+            # the stamped branch is a range on starts_at_idx; only the
+            # NULL rows pay for the computed start
+            event_at = f"coalesce(e.{TIMESTAMP_COLUMN}::bigint, {computed})"
+            window = (
+                f"((e.{TIMESTAMP_COLUMN} >= %(start)s AND e.{TIMESTAMP_COLUMN} < %(end)s) OR "
+                f"(e.{TIMESTAMP_COLUMN} IS NULL AND {computed} >= %(start)s AND {computed} < %(end)s))"
+            )
+        else:
+            event_at = computed
+            window = f"{computed} >= %(start)s AND {computed} < %(end)s"
+        where, params = cohort_filter(cohorts, lambda name: f"%({name})s")
+        sql = f"SELECT e.*, {event_at} AS event_at FROM {table} e WHERE {window}{where}"
+        return sql, params
+
+    def _finish(self, df):
+        df[TIMESTAMP_COLUMN] = df.pop("event_at").astype("Int64")
+        return df
+
+    def _upcoming(self, kind, start, end, cohorts):
+        sql, params = self._events(kind, cohorts)
+        return self._finish(pd.read_sql_query(
+            sql, self._connection(), params={"start": start, "end": end, **params}
+        ))
+
+    def _recipient_year(self):
+        # An integer year (as ensure_schema creates it) lets the join use
+        # students_cohort_norm_idx; older text columns like '2025-26'
+        # are matched on their first four digits
+        if self._column_type("students", "year") in ("integer", "bigint", "smallint"):
+            return "s.year = %(year)s::int"
+        return r"substring(s.year::text from '\d{4}') = %(year)s"
+
+    def _upcoming_recipients(self, kind, start, end, cohorts):
+        events, params = self._events(kind, cohorts)
+        sql = (
+            f"SELECT e.*, {STUDENT_COLUMNS} FROM ({events}) e "
+            "JOIN students s "
+            "ON lower(trim(s.course)) = lower(trim(e.course)) "
+            "AND upper(trim(s.batch_name)) = upper(trim(e.batch_name)) "
+            "AND lower(trim(s.mode)) = lower(trim(coalesce(e.mode, 'offline'))) "
+            f"WHERE {self._recipient_year()}"
+        )
+        return self._finish(pd.read_sql_query(
+            sql, self._connection(),
+            params={"start": start, "end": end, "year": RECIPIENT_YEAR, **params},
+        ))
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
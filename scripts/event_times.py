@@ -0,0 +1,50 @@
+import pandas as pd
+
+# ============================================================
+# CANONICAL EVENT TIMESTAMPS
+# ============================================================
+# Schedules are stored as local (IST) date/time strings. They are
+# parsed once, when data is imported or reloaded, into a UTC epoch
+# column `starts_at_utc` that both notifiers compare against, so
+# the email and Discord channels agree on the exact same instant.
+
+TIMEZONE = "Asia/Kolkata"
+TIMESTAMP_COLUMN = "starts_at_utc"
+
+# Assignments without a time are due at the end of the day
+DEFAULT_DUE_TIME = "23:59"
+
+
+def to_epoch(local_times):
+    """Localise naive IST datetimes and return nullable UTC epoch seconds."""
+    localized = local_times.dt.tz_localize(TIMEZONE, ambiguous="NaT", nonexistent="NaT")
+    epoch = pd.Series(pd.NA, index=local_times.index, dtype="Int64")
+    valid = localized.notna()
+    epoch[valid] = (localized[valid].dt.tz_convert("UTC").astype("int64") // 10**9).astype("int64")
+    return epoch
+
+
+def class_start_times(df):
+    text = df["date"].astype(str).str.strip() + " " + df["time"].astype(str).str.strip()
+    return to_epoch(pd.to_datetime(text, format="mixed", errors="coerce"))
+
+
+def assignment_due_times(df):
+    raw = df["due_date"].astype(str).str.replace(".", ":", regex=False).str.strip()
+    raw = raw.where(raw.str.len() > 10, raw + " " + DEFAULT_DUE_TIME)
+    return to_epoch(pd.to_datetime(raw, format="%Y-%m-%d %H:%M", errors="coerce"))
+
+
+def with_timestamps(df, kind):
+    """Return df with `starts_at_utc` filled in wherever it is missing."""
+    if df.empty:
+        return df.assign(**{TIMESTAMP_COLUMN: pd.Series(dtype="Int64")})
+
+    parse = class_start_times if kind == "class" else assignment_due_times
+    if TIMESTAMP_COLUMN in df.columns:
+        existing = pd.to_numeric(df[TIMESTAMP_COLUMN], errors="coerce").astype("Int64")
+        if existing.notna().all():
+            return df.assign(**{TIMESTAMP_COLUMN: existing})
+        return df.assign(**{TIMESTAMP_COLUMN: existing.fillna(parse(df))})
+
+    return df.assign(**{TIMESTAMP_COLUMN: parse(df)})
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================================================
+# FAN-OUT SETTINGS
+# ============================================================
+# Defaults stay under Gmail's SMTP sending limits; raise them for
+# Workspace accounts or relay services.
+
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "3"))
+EMAIL_MAX_PER_MINUTE = int(os.getenv("EMAIL_MAX_PER_MINUTE", "120"))
+EMAIL_DOMAIN_MAX_PER_MINUTE = int(os.getenv("EMAIL_DOMAIN_MAX_PER_MINUTE", "100"))
+
+# ============================================================
+# RATE LIMITER (TOKEN BUCKET)
+# ============================================================
+
+class RateLimiter:
+    """Blocking token bucket allowing `per_minute` acquisitions per minute."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, per_minute // 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def recipient_domain(message):
+    return message[0].rsplit("@", 1)[-1].lower()
+
+# ============================================================
+# FAN-OUT
+# ============================================================
+
+class FanOut:
+    """Delivers messages concurrently under global and per-domain rate limits."""
+
+    def __init__(self, send, concurrency=EMAIL_CONCURRENCY,
+                 max_per_minute=EMAIL_MAX_PER_MINUTE,
+                 domain_max_per_minute=EMAIL_DOMAIN_MAX_PER_MINUTE):
+        self.send = send
+        self.concurrency = concurrency
+        self.domain_max_per_minute = domain_max_per_minute
+        self.global_limit = RateLimiter(max_per_minute) if max_per_minute else None
+        self._domain_limits = {}
+        self._domain_lock = threading.Lock()
+
+    def _domain_limit(self, domain):
+        if not self.domain_max_per_minute:
+            return None
+        with self._domain_lock:
+            limiter = self._domain_limits.get(domain)
+            if limiter is None:
+                limiter = RateLimiter(self.domain_max_per_minute)
+                self._domain_limits[domain] = limiter
+            return limiter
+
+    def _deliver(self, message):
+        domain_limit = self._domain_limit(recipient_domain(message))
+        if domain_limit:
+            domain_limit.acquire()
+        if self.global_limit:
+            self.global_limit.acquire()
+        return self.send(message)
+
+    def run(self, messages):
+        """Send every message and return the send results in input order."""
+        if not messages:
+            return []
+        workers = max(1, min(self.concurrency, len(messages)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email") as pool:
+            return list(pool.map(self._deliver, messages))
@@ -1,118 +1,232 @@
 
-import sqlite3
+import argparse
+import hashlib
+import logging
+import time
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from change_feed import open_feed
+from event_times import TIMESTAMP_COLUMN, assignment_due_times, class_start_times
+from logs import configure_logging
+from metrics import IMPORT_ROWS, STAGE_SECONDS, flush_exporters, start_exporter
+from storage import DEFAULT_DATA_DIR, DEFAULT_DB_PATH, open_storage
+
+log = logging.getLogger("reminders.import")
 
 # ----------------------------------------------------------
 # Paths
 # ----------------------------------------------------------
-DB_PATH = r"D:\trailnew\automated_reminder_system-main\database\reminders.db"
-DATA_DIR = r"D:\trailnew\automated_reminder_system-main\data"
+# DB_PATH may also be a postgres:// URL
+DB_PATH = os.getenv("DB_PATH", DEFAULT_DB_PATH)
+DATA_DIR = os.getenv("DATA_DIR", DEFAULT_DATA_DIR)
 
 
 # ----------------------------------------------------------
 # Database connection
 # ----------------------------------------------------------
 def connect_db():
-    return sqlite3.connect(DB_PATH)
+    return open_storage(DB_PATH).connection()
 
 
 # ----------------------------------------------------------
 # Create tables if not exist
 # ----------------------------------------------------------
 def create_tables():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        discord_id TEXT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        mode TEXT
-    );
-    """)
+    open_storage(DB_PATH).ensure_schema()
+    log.info("Tables verified or created")
+
+
+# ----------------------------------------------------------
+# Change notifications
+# ----------------------------------------------------------
+# Once the writes are committed, running notifiers are told which
+# cohorts changed so they reload those right away (see change_feed).
+# table_versions() is taken before writing so they can tell whether
+# the import was the only change since their last load.
+
+def table_versions():
+    try:
+        return open_feed(open_storage(DB_PATH)).versions()
+    except Exception as e:
+        log.warning("Could not read table versions", extra={"error": e})
+        return None
+
+
+def notify_changes(cohorts, before):
+    if not cohorts:
+        return
+    try:
+        listeners = open_feed(open_storage(DB_PATH)).publish(cohorts, before)
+    except Exception as e:
+        log.warning("Could not notify schedulers", extra={"error": e})
+        return
+    log.info("Schedulers notified", extra={"listeners": listeners, "cohorts": len(set(cohorts))})
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS classes (
-        class_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        mode TEXT,
-        session_name TEXT NOT NULL,
-        date TEXT NOT NULL,
-        time TEXT NOT NULL
-    );
-    """)
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS assignments (
-        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course TEXT NOT NULL,
-        batch_name TEXT,
-        year INTEGER,
-        mode TEXT,
-        subject TEXT NOT NULL,
-        due_date TEXT NOT NULL
+# ----------------------------------------------------------
+# Import state (content hashes)
+# ----------------------------------------------------------
+# A workbook whose bytes are unchanged is skipped without parsing.
+# Inside a changed workbook, each sheet's parsed content is hashed
+# too, and only sheets whose hash moved are diffed against the DB.
+
+def create_import_state(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS import_state (
+        source TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        PRIMARY KEY (source, sheet)
     );
     """)
 
-    conn.commit()
-    conn.close()
-    print("✅ Tables verified or created successfully.")
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_hash(df):
+    hashed = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + ",".join(df.columns).encode()).hexdigest()
+
+
+def stored_hash(conn, source, sheet):
+    row = conn.execute(
+        "SELECT content_hash FROM import_state WHERE source=? AND sheet=?",
+        (source, sheet)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def save_hash(conn, source, sheet, content_hash):
+    conn.execute(
+        "INSERT INTO import_state (source, sheet, content_hash) VALUES (?, ?, ?) "
+        "ON CONFLICT(source, sheet) DO UPDATE SET content_hash = excluded.content_hash",
+        (source, sheet, content_hash)
+    )
 
 
 # ----------------------------------------------------------
-# Import students
+# Row-level sync
 # ----------------------------------------------------------
-def import_students(course, batch, year, mode, file_path):
-    print(f"📥 Importing students from {file_path} ...")
-    conn = connect_db()
+# Rows are matched on a natural key within the cohort; duplicates
+# of the same key are told apart by their position. Only inserted,
+# changed and vanished rows are written.
 
-    try:
-        df = pd.read_excel(file_path, sheet_name="students")
-    except Exception:
-        conn.close()
-        return
+SHEETS = {
+    "students": {"sheet": "students", "id": "student_id", "key": ["email"]},
+    "classes": {"sheet": "schedule", "id": "class_id", "key": ["session_name", "date", "time"]},
+    "assignments": {"sheet": "assignment", "id": "assignment_id", "key": ["subject", "due_date"]},
+}
 
-    if "student_id" in df.columns:
-        df = df.drop(columns=["student_id"])
 
-    df.columns = [c.strip().lower() for c in df.columns]
-    df["course"] = course
-    df["batch_name"] = batch
-    df["year"] = year
-    df["mode"] = mode
+def _comparable(df, columns):
+    values = df[columns].astype(object).where(df[columns].notna(), None).astype(str)
+    return list(values.itertuples(index=False, name=None))
 
-    conn.execute(
-        "DELETE FROM students WHERE course=? AND batch_name=? AND year=?",
+
+def _with_occurrence(df, key):
+    df = df.copy()
+    df["_occurrence"] = df.groupby(key, dropna=False).cumcount()
+    return df
+
+
+def _records(df, columns):
+    values = df[columns].astype(object).where(df[columns].notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def sync_rows(conn, table, df, course, batch, year):
+    """Upsert/delete `table` rows of one cohort so they match df. Returns (added, changed, removed)."""
+    spec = SHEETS[table]
+    id_col, key = spec["id"], spec["key"]
+
+    existing = conn.read_frame(
+        f"SELECT * FROM {table} WHERE course=? AND batch_name=? AND year=?",
         (course, batch, year)
     )
-    conn.commit()
-
-    df.to_sql("students", conn, if_exists="append", index=False)
-    conn.close()
-    print(f"✅ Imported {len(df)} students for {course}-{batch}-{year} ({mode})")
+    columns = [c for c in df.columns if c != id_col]
+    compare = [c for c in columns if c in existing.columns]
+
+    new = _with_occurrence(df, key)
+    old = _with_occurrence(existing, key)
+    new_keys = _comparable(new, key + ["_occurrence"])
+    old_keys = _comparable(old, key + ["_occurrence"])
+
+    old_by_key = dict(zip(old_keys, range(len(old))))
+    new_key_set = set(new_keys)
+    old_ids = old[id_col].tolist()
+
+    removed = [int(old_ids[j]) for k, j in old_by_key.items() if k not in new_key_set]
+
+    added_rows, changed = [], []
+    new_cmp = _comparable(new, compare)
+    old_cmp = _comparable(old, compare)
+    for i, k in enumerate(new_keys):
+        j = old_by_key.get(k)
+        if j is None:
+            added_rows.append(i)
+        elif new_cmp[i] != old_cmp[j]:
+            changed.append((i, int(old_ids[j])))
+
+    if removed:
+        conn.executemany(f"DELETE FROM {table} WHERE {id_col}=?", [(r,) for r in removed])
+
+    if changed:
+        assignments = ", ".join(f"{c}=?" for c in columns)
+        rows = _records(new.iloc[[i for i, _ in changed]], columns)
+        conn.executemany(
+            f"UPDATE {table} SET {assignments} WHERE {id_col}=?",
+            [row + (row_id,) for row, (_, row_id) in zip(rows, changed)]
+        )
+
+    if added_rows:
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            _records(new.iloc[added_rows], columns)
+        )
+
+    return len(added_rows), len(changed), len(removed)
 
 
 # ----------------------------------------------------------
-# Import classes
+# Sheet readers
 # ----------------------------------------------------------
-def import_classes(course, batch, year, mode, file_path):
-    print(f"📘 Importing classes from {file_path} ...")
-    conn = connect_db()
+# Every sheet of a workbook is parsed in one pass. The Rust-based
+# calamine reader (pip install python-calamine) is used when it is
+# installed; otherwise openpyxl.
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+
+def read_sheets(file_path):
+    return pd.read_excel(file_path, sheet_name=None, engine=EXCEL_ENGINE)
+
+
+def prepare_students(df, course, batch, year, mode):
+    if "student_id" in df.columns:
+        df = df.drop(columns=["student_id"])
+
+    df.columns = [c.strip().lower() for c in df.columns]
+    df["course"] = course
+    df["batch_name"] = batch
+    df["year"] = year
+    df["mode"] = mode
+    return df
 
-    try:
-        df = pd.read_excel(file_path, sheet_name="schedule")
-    except Exception:
-        conn.close()
-        return
 
+def prepare_classes(df, course, batch, year, mode):
     if "class_id" in df.columns:
         df = df.drop(columns=["class_id"])
 
@@ -133,61 +247,139 @@ def import_classes(course, batch, year, mode, file_path):
         except:
             return "09:00"
 
-    df["time"] = df["time"].apply(parse_time)
+    # the same few start times repeat across a sheet; parse each once
+    parsed = {}
+    df["time"] = [parsed[v] if v in parsed else parsed.setdefault(v, parse_time(v)) for v in df["time"]]
+    df[TIMESTAMP_COLUMN] = class_start_times(df)
+    return df
 
-    conn.execute(
-        "DELETE FROM classes WHERE course=? AND batch_name=? AND year=?",
-        (course, batch, year)
-    )
-    conn.commit()
 
-    df.to_sql("classes", conn, if_exists="append", index=False)
-    conn.close()
-    print(f"✅ Imported {len(df)} classes for {course}-{batch}-{year} ({mode})")
+def prepare_assignments(df, course, batch, year, mode):
+    if "assignment_id" in df.columns:
+        df = df.drop(columns=["assignment_id"])
+
+    df.columns = [c.strip().lower() for c in df.columns]
+    df["course"] = course
+    df["batch_name"] = batch
+    df["year"] = year
+    df["mode"] = mode
+
+    df["due_date"] = pd.to_datetime(df["due_date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    df[TIMESTAMP_COLUMN] = assignment_due_times(df)
+    return df
+
+
+PREPARE = {
+    "students": prepare_students,
+    "classes": prepare_classes,
+    "assignments": prepare_assignments,
+}
 
 
 # ----------------------------------------------------------
-# Import assignments
+# Import one sheet / one workbook
 # ----------------------------------------------------------
+def read_workbook(file_path, course, batch, year, mode):
+    """Parse every sheet of a workbook once. Returns {table: prepared DataFrame}."""
+    sheets = read_sheets(file_path)
+    frames = {}
+    for table, spec in SHEETS.items():
+        if spec["sheet"] in sheets:
+            frames[table] = PREPARE[table](sheets[spec["sheet"]], course, batch, year, mode)
+    return frames
+
+
+def import_sheet(conn, table, df, course, batch, year, mode, source, force=False):
+    """Sync one prepared sheet if its content changed. Returns True if it was written."""
+    with STAGE_SECONDS.time(component="import", stage="hash"):
+        content_hash = frame_hash(df)
+        unchanged = not force and stored_hash(conn, source, table) == content_hash
+    if unchanged:
+        log.info("Sheet unchanged", extra={"table": table, "source": source})
+        return False
+
+    with STAGE_SECONDS.time(component="import", stage="sync"):
+        added, changed, removed = sync_rows(conn, table, df, course, batch, year)
+        save_hash(conn, source, table, content_hash)
+    for change, n in (("added", added), ("changed", changed), ("removed", removed)):
+        IMPORT_ROWS.inc(n, table=table, change=change)
+    log.info("Sheet synced", extra={
+        "table": table, "cohort": f"{course}-{batch}-{year}", "mode": mode,
+        "added": added, "changed": changed, "removed": removed,
+    })
+    return True
+
+
+def import_students(course, batch, year, mode, file_path):
+    log.info("Importing students", extra={"file": file_path})
+    _import_one("students", course, batch, year, mode, file_path)
+
+
+def import_classes(course, batch, year, mode, file_path):
+    log.info("Importing classes", extra={"file": file_path})
+    _import_one("classes", course, batch, year, mode, file_path)
+
+
 def import_assignments(course, batch, year, mode, file_path):
-    print(f"📗 Importing assignments from {file_path} ...")
-    conn = connect_db()
+    log.info("Importing assignments", extra={"file": file_path})
+    _import_one("assignments", course, batch, year, mode, file_path)
+
 
+def _import_one(table, course, batch, year, mode, file_path):
     try:
-        df = pd.read_excel(file_path, sheet_name="assignment")
-    except Exception:
-        conn.close()
+        raw = pd.read_excel(file_path, sheet_name=SHEETS[table]["sheet"], engine=EXCEL_ENGINE)
+    except ValueError:
         return
 
-    if "assignment_id" in df.columns:
-        df = df.drop(columns=["assignment_id"])
+    df = PREPARE[table](raw, course, batch, year, mode)
+    before = table_versions()
+    conn = connect_db()
+    try:
+        with conn:
+            create_import_state(conn)
+            import_sheet(conn, table, df, course, batch, year, mode,
+                         os.path.basename(file_path), force=True)
+    finally:
+        conn.close()
+    notify_changes([(course, batch, year)], before)
 
-    df.columns = [c.strip().lower() for c in df.columns]
-    df["course"] = course
-    df["batch_name"] = batch
-    df["year"] = year
-    df["mode"] = mode
 
-    df["due_date"] = pd.to_datetime(df["due_date"], errors="coerce").dt.strftime("%Y-%m-%d")
+def import_workbook(conn, course, batch, year, mode, file_path, content_hash, frames=None):
+    """Write all sheets of one workbook in a single transaction. Returns True if any sheet was written."""
+    source = os.path.basename(file_path)
+    if frames is None:
+        frames = read_workbook(file_path, course, batch, year, mode)
 
-    conn.execute(
-        "DELETE FROM assignments WHERE course=? AND batch_name=? AND year=?",
-        (course, batch, year)
-    )
-    conn.commit()
+    with conn:
+        written = [import_sheet(conn, table, df, course, batch, year, mode, source)
+                   for table, df in frames.items()]
+        save_hash(conn, source, "*", content_hash)
+    return any(written)
 
-    df.to_sql("assignments", conn, if_exists="append", index=False)
-    conn.close()
-    print(f"✅ Imported {len(df)} assignments for {course}-{batch}-{year} ({mode})")
+
+def parse_file_name(file):
+    base = os.path.splitext(file)[0]
+    parts = base.split("_")
+
+    course = parts[0]
+    batch = parts[1]
+    year = parts[2]
+
+    mode = "Online" if "online" in base.lower() else "Offline"
+    return course, batch, year, mode
 
 
 # ----------------------------------------------------------
 # Import all Excel files
 # ----------------------------------------------------------
-def import_all_courses():
-    create_tables()
+# Workbooks whose bytes are unchanged are skipped up front. The rest
+# are parsed - in worker processes when jobs > 1 - and every write
+# goes through this process's single connection, since SQLite allows
+# only one writer at a time anyway.
 
-    for file in os.listdir(DATA_DIR):
+def list_workbooks(data_dir):
+    files = []
+    for file in sorted(os.listdir(data_dir)):
 
         # only Excel files
         if not file.endswith(".xlsx"):
@@ -197,31 +389,81 @@ def import_all_courses():
         if file.lower() == "sent_reminders.xlsx":
             continue
 
-        try:
-            base = file.replace(".xlsx", "")
-            parts = base.split("_")
+        files.append(file)
+    return files
 
-            course = parts[0]
-            batch = parts[1]
-            year = parts[2]
 
-            mode = "Online" if "online" in base.lower() else "Offline"
-            print(f"📄 Detected mode: {mode} for file '{file}'")
+def parse_workbook(file_path):
+    """Worker: parse one workbook. Returns (file_path, frames or None, error or None, seconds)."""
+    # timed here and recorded by the caller, since workers are other processes
+    started = time.perf_counter()
+    try:
+        course, batch, year, mode = parse_file_name(os.path.basename(file_path))
+        frames = read_workbook(file_path, course, batch, year, mode)
+        return file_path, frames, None, time.perf_counter() - started
+    except Exception as e:
+        return file_path, None, e, time.perf_counter() - started
 
-            file_path = os.path.join(DATA_DIR, file)
 
-            import_students(course, batch, year, mode, file_path)
-            import_classes(course, batch, year, mode, file_path)
-            import_assignments(course, batch, year, mode, file_path)
+def import_all_courses(data_dir=None, jobs=1):
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    create_tables()
+
+    conn = connect_db()
+    with conn:
+        create_import_state(conn)
+
+    pending = {}
+    for file in list_workbooks(data_dir):
+        file_path = os.path.join(data_dir, file)
+        content_hash = file_hash(file_path)
+        if stored_hash(conn, file, "*") == content_hash:
+            log.info("Workbook unchanged", extra={"file": file})
+            continue
+        pending[file_path] = content_hash
+
+    before, changed = table_versions(), []
+
+    def write(file_path, frames, error, seconds):
+        file = os.path.basename(file_path)
+        STAGE_SECONDS.observe(seconds, component="import", stage="read")
+        try:
+            if error is not None:
+                raise error
+            course, batch, year, mode = parse_file_name(file)
+            log.debug("Detected mode", extra={"file": file, "mode": mode})
+            if import_workbook(conn, course, batch, year, mode, file_path, pending[file_path], frames):
+                changed.append((course, batch, year))
 
         except Exception as e:
-            print(f"❌ Error processing {file}: {e}")
+            log.error("Error processing workbook", extra={"file": file, "error": e})
+
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(parse_workbook, file_path) for file_path in pending]
+            for future in as_completed(futures):
+                write(*future.result())
+    else:
+        for file_path in pending:
+            write(*parse_workbook(file_path))
 
-    print("\n🎓 All data imported successfully!")
+    conn.close()
+    notify_changes(changed, before)
+    log.info("All data imported", extra={"workbooks": len(pending), "changed": len(changed)})
 
 
 # ----------------------------------------------------------
 # Run
 # ----------------------------------------------------------
 if __name__ == "__main__":
-    import_all_courses()
+    parser = argparse.ArgumentParser(description="Import course workbooks into the reminders database")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for parsing workbooks (0 = one per CPU)")
+    args = parser.parse_args()
+
+    configure_logging()
+    start_exporter()
+    with STAGE_SECONDS.time(component="import", stage="total"):
+        import_all_courses(args.data_dir, args.jobs or os.cpu_count())
+    flush_exporters()
@@ -0,0 +1,145 @@
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+
+import import_data
+from import_data import (
+    PREPARE, SHEETS, _records, connect_db, create_import_state, create_tables,
+    file_hash, notify_changes, parse_file_name, save_hash, stored_hash, table_versions,
+)
+from logs import configure_logging
+from metrics import IMPORT_ROWS, STAGE_SECONDS, flush_exporters, start_exporter
+
+log = logging.getLogger("reminders.import")
+
+# ----------------------------------------------------------
+# Streaming CSV / Parquet import
+# ----------------------------------------------------------
+# Registrar exports arrive as one file per sheet, named like the
+# workbooks plus the sheet name:
+#
+#     DSA_B6_2025_Offline.students.csv
+#     DSA_B6_2025_Offline.schedule.parquet
+#
+# Files are read in chunks, each chunk goes through the same
+# normalization as the Excel import, and is inserted straight away,
+# so memory stays bounded by the chunk size. A file replaces its
+# cohort's rows for that table in one transaction; unchanged files
+# (same bytes) are skipped. Keep each cohort in one format - a
+# workbook and a CSV for the same cohort would overwrite each other.
+
+CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "50000"))
+
+TABLE_FOR_SHEET = {spec["sheet"]: table for table, spec in SHEETS.items()}
+
+STREAM_SUFFIXES = (".csv", ".parquet")
+
+
+def parse_stream_name(file):
+    """'DSA_B6_2025_Offline.schedule.csv' -> ('classes', course, batch, year, mode)."""
+    stem, ext = os.path.splitext(file)
+    base, _, sheet = stem.rpartition(".")
+    if ext not in STREAM_SUFFIXES or sheet not in TABLE_FOR_SHEET:
+        return None
+    return (TABLE_FOR_SHEET[sheet],) + parse_file_name(base)
+
+
+def read_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows."""
+    if file_path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("pyarrow is required to import Parquet files (pip install pyarrow)")
+
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Everything as text so a chunk's inferred types don't depend on its rows
+        yield from pd.read_csv(file_path, chunksize=chunk_rows, dtype=str, keep_default_na=True)
+
+
+def stream_file(conn, file_path, chunk_rows=CHUNK_ROWS):
+    """Replace one cohort table from a CSV/Parquet file. Returns rows written, or None if skipped."""
+    file = os.path.basename(file_path)
+    table, course, batch, year, mode = parse_stream_name(file)
+
+    content_hash = file_hash(file_path)
+    if stored_hash(conn, file, "*") == content_hash:
+        log.info("File unchanged", extra={"file": file})
+        return None
+
+    started = time.perf_counter()
+    rows = 0
+    with conn:
+        conn.execute(
+            f"DELETE FROM {table} WHERE course=? AND batch_name=? AND year=?",
+            (course, batch, year)
+        )
+        id_col = SHEETS[table]["id"]
+        for chunk in read_chunks(file_path, chunk_rows):
+            df = PREPARE[table](chunk, course, batch, year, mode)
+            columns = [c for c in df.columns if c != id_col]
+            placeholders = ", ".join("?" for _ in columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                _records(df, columns)
+            )
+            rows += len(df)
+        save_hash(conn, file, "*", content_hash)
+
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, component="import", stage="stream")
+    IMPORT_ROWS.inc(rows, table=table, change="replaced")
+    log.info("Table streamed", extra={
+        "table": table, "cohort": f"{course}-{batch}-{year}", "mode": mode, "rows": rows,
+        "seconds": round(elapsed, 3), "rows_per_second": round(rows / max(elapsed, 1e-9)),
+    })
+    return rows
+
+
+def import_streams(data_dir=None, chunk_rows=CHUNK_ROWS):
+    data_dir = import_data.DATA_DIR if data_dir is None else data_dir
+    create_tables()
+
+    conn = connect_db()
+    with conn:
+        create_import_state(conn)
+
+    before, changed = table_versions(), []
+    for file in sorted(os.listdir(data_dir)):
+        if not file.endswith(STREAM_SUFFIXES):
+            continue
+        if parse_stream_name(file) is None:
+            log.warning("Skipping file: expected Course_Batch_Year_Mode.<sheet>{.csv,.parquet}",
+                        extra={"file": file})
+            continue
+
+        try:
+            if stream_file(conn, os.path.join(data_dir, file), chunk_rows) is not None:
+                changed.append(parse_stream_name(file)[1:4])
+        except Exception as e:
+            log.error("Error processing file", extra={"file": file, "error": e})
+
+    conn.close()
+    notify_changes(changed, before)
+    log.info("All data imported", extra={"changed": len(changed)})
+
+
+# ----------------------------------------------------------
+# Run
+# ----------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream CSV/Parquet exports into the reminders database")
+    parser.add_argument("--data-dir", default=import_data.DATA_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    configure_logging()
+    start_exporter()
+    with STAGE_SECONDS.time(component="import", stage="total"):
+        import_streams(args.data_dir, args.chunk_rows)
+    flush_exporters()
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import sys
+
+# ============================================================
+# LEVELED, STRUCTURED LOGGING
+# ============================================================
+# Every script logs through logging.getLogger("reminders.<part>").
+# Values worth filtering on go in `extra`, and end up as key=value
+# pairs (LOG_FORMAT=text) or JSON fields (LOG_FORMAT=json):
+#
+#   log.info("Email sent", extra={"recipient": recipient})
+#   2026-01-05 09:00:00 INFO reminders.email Email sent recipient=a@b.c
+#
+# Messages use %-style arguments, so a disabled level costs one
+# isEnabledFor() check and nothing is formatted.
+#
+#   LOG_LEVEL   DEBUG | INFO (default) | WARNING | ERROR
+#   LOG_FORMAT  text (default) | json
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record):
+        line = super().format(record)
+        extra = fields(record)
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, format=LOG_FORMAT):
+    """Send the "reminders" loggers to stderr; call once from each entry point."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    root = logging.getLogger("reminders")
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    root.propagate = False
+    return root
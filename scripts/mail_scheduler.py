@@ -1,14 +1,29 @@
 #ouqx gboz ampr cwjb-alert email
 # ouqx gboz ampr cwjb-alert email
+import argparse
+import logging
 import os
 import time
 import pytz
-import smtplib
-import psycopg2
-import pandas as pd
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
+from checkpoint import Checkpoint
+from change_feed import PostgresChangeFeed, cohort_key, merge_changes, reload_cohorts, row_cohort
+from coalesce import DIGEST_WINDOW_SECONDS, coalesce
+from db_cache import VERSIONED_TABLES, PostgresTableCache
+from event_queries import PostgresEventQueries
+from event_times import TIMESTAMP_COLUMN, with_timestamps
+from fanout import FanOut
+from logs import configure_logging
+from metrics import REMINDERS, SCHEDULE_REFRESHES, SCHEDULED, STAGE_SECONDS, TICK_SECONDS, exporting, start_exporter
+from reminder_messages import EMAIL_WINDOWS, email_item, is_placeholder, prepare_job
+from reminder_scheduler import ReminderScheduler
+from sent_store import PostgresSentStore, default_journal_path
+from outbox import OUTBOX_BATCH, Outbox
+from sharding import Shard
+from smtp_pool import SMTPPool
+from storage import open_storage
+from templates import MimeLayout
 
 # ============================================================
 # EMAIL CREDS (RAILWAY VARIABLES)
@@ -20,6 +35,8 @@ SENDER_PASS = os.getenv("SENDER_PASS")
 if not SENDER_EMAIL or not SENDER_PASS:
     raise RuntimeError("❌ Email credentials missing")
 
+log = logging.getLogger("reminders.email")
+
 # ============================================================
 # TIMEZONE
 # ============================================================
@@ -30,191 +47,293 @@ IST = pytz.timezone("Asia/Kolkata")
 # DATABASE CONNECTION (LAZY / RUNTIME SAFE)
 # ============================================================
 
-def get_connection():
+def get_storage():
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise RuntimeError("❌ DATABASE_URL not found at runtime")
-    return psycopg2.connect(database_url)
+    return open_storage(database_url)
+
+def get_connection():
+    # Held by a long-lived reader (table cache / event queries)
+    return get_storage().acquire()
 
 # ============================================================
-# SENT REMINDERS (POSTGRESQL - PERSISTENT)
+# SENT REMINDERS (POSTGRESQL - PERSISTENT, BATCHED)
 # ============================================================
 
+sent_store = None
+
+def get_sent_store():
+    global sent_store
+    if sent_store is None:
+        # One journal per shard: --shard/--shards may differ from the environment
+        sent_store = PostgresSentStore(pool=get_storage().pool, journal_path=default_journal_path(shard))
+    return sent_store
+
 def load_sent():
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT reminder_key FROM sent_reminders")
-            return {r[0] for r in cur.fetchall()}
+    return get_sent_store().load()
 
 def mark_sent(key):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO sent_reminders (reminder_key) VALUES (%s) ON CONFLICT DO NOTHING",
-                (key,)
-            )
-            conn.commit()
+    get_sent_store().add(key)
 
 # ============================================================
-# EMAIL FUNCTION
+# SHARDING + OUTBOX (MULTI-WORKER, DURABLE RETRIES)
 # ============================================================
+# Each worker schedules only its shard's recipients. Due reminders
+# go to the outbox table first; delivery leases batches from it and
+# failed sends come back with backoff until their window closes
+# (see sharding.py, outbox.py)
 
-def send_email(recipient, subject, body):
-    if "@example.com" in recipient.lower():
-        return
+shard = Shard.from_env()
+outbox = None
+
+def get_outbox():
+    global outbox
+    if outbox is None:
+        outbox = Outbox(get_storage())
+    return outbox
 
-    msg = MIMEMultipart()
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = recipient
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
+# Last processed instant, per shard (restarts catch up from here)
+checkpoint = None
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, timeout=30) as server:
-            server.login(SENDER_EMAIL, SENDER_PASS)
-            server.send_message(msg)
-        print(f"📧 Email sent → {recipient}")
-    except Exception as e:
-        print("❌ Email error:", e)
+def get_checkpoint():
+    global checkpoint
+    if checkpoint is None:
+        checkpoint = Checkpoint(get_storage(), f"email-{shard.index}-of-{shard.count}")
+    return checkpoint
+
+# ============================================================
+# EMAIL FUNCTION
+# ============================================================
+
+smtp_pool = SMTPPool(SENDER_EMAIL, SENDER_PASS)
+fan_out = FanOut(smtp_pool.send)
+mime_layout = MimeLayout(SENDER_EMAIL)
+
+def send_email(recipient, subject, body):
+    if is_placeholder(recipient):
+        return True
+
+    result = smtp_pool.send((recipient, subject, body))
+    if result.ok:
+        log.debug("Email sent", extra={"recipient": recipient})
+    else:
+        log.warning("Email failed", extra={"recipient": recipient, "error": result.error})
+    return result.ok
+
+def deliver_batch(sent_reminders, now_ts):
+    """Lease one batch of queued emails and send it; returns the number of rows leased."""
+    box = get_outbox()
+    rows = box.dequeue("email", now=now_ts)
+    if not rows:
+        return 0
+
+    # One email per recipient: a digest when several reminders are queued
+    jobs = []
+    for recipient, group in coalesce(rows, lambda row: row["target"]):
+        stu = {"name": group[0]["payload"]["name"], "email": recipient}
+        items = [(row["job_key"], row["payload"]["subject"], row["payload"]["section"]) for row in group]
+        jobs.append((group, prepare_job(mime_layout, stu, items)))
+
+    started = time.monotonic()
+    with STAGE_SECONDS.time(component="email", stage="send_email"):
+        results = fan_out.run([message for _, (_, message) in jobs])
+    elapsed = time.monotonic() - started
+
+    delivered = []
+    for (group, (keys, message)), result in zip(jobs, results):
+        recipient = message.recipient
+        if result.ok:
+            log.debug("Email sent", extra={"recipient": recipient})
+            for key in keys:
+                mark_sent(key)
+                sent_reminders.add(key)
+            delivered.extend(group)
+        else:
+            log.warning("Email failed", extra={"recipient": recipient, "error": result.error})
+            REMINDERS.inc(len(group), channel="email", outcome="failed")
+            box.fail(group, result.error)
+    box.ack(delivered)
+    REMINDERS.inc(len(delivered), channel="email", outcome="sent")
+
+    log.info("Emails sent", extra={
+        "sent": sum(r.ok for r in results), "emails": len(jobs), "seconds": round(elapsed, 3),
+        "per_second": round(len(jobs) / max(elapsed, 1e-6), 1),
+    })
+    return len(rows)
 
 # ============================================================
 # DB HELPERS (POSTGRESQL + PANDAS)
 # ============================================================
 
-def fetch_df(query):
-    with get_connection() as conn:
-        return pd.read_sql_query(query, conn)
+# Version probes only: rows come from windowed queries
+table_cache = PostgresTableCache(get_connection)
+event_queries = PostgresEventQueries(get_connection)
 
-def get_students():
-    df = fetch_df("SELECT * FROM students")
-    df["course"] = df["course"].str.strip().str.lower()
-    df["batch_name"] = df["batch_name"].str.strip().str.upper()
-    df["mode"] = df["mode"].str.strip().str.lower()
-    df["year"] = df["year"].astype(str).str.strip()
-    return df
+def get_classes(start, end, cohorts=None):
+    return event_queries.upcoming_recipients("class", start, end, cohorts)
 
-def get_assignments():
-    df = fetch_df("SELECT * FROM assignments")
+def get_assignments(start, end, cohorts=None):
+    df = event_queries.upcoming_recipients("assign", start, end, cohorts)
     df["course"] = df["course"].str.strip().str.lower()
     df["batch_name"] = df["batch_name"].str.strip().str.upper()
     df["mode"] = df["mode"].fillna("offline").str.strip().str.lower()
     return df
 
-def get_classes():
-    return fetch_df("SELECT * FROM classes")
-
 # ============================================================
-# REMINDER LOOP
+# REMINDER SCHEDULE
 # ============================================================
 
-def send_reminders(sent_reminders):
-    now = datetime.now(IST)
-    print(f"\n⏰ Checking EMAIL reminders at {now:%Y-%m-%d %H:%M:%S} IST")
+# The importer announces each import on the change feed and the
+# affected cohorts are reloaded at once; this is the fallback wake-up
+# for picking up other writes to the database
+RELOAD_INTERVAL = int(os.getenv("RELOAD_INTERVAL", "300"))
+
+# Only events whose reminders can fire within the next couple of
+# spans are loaded; the schedule is reloaded every span
+HORIZON_SPAN = 600
+
+scheduler = ReminderScheduler({"class": EMAIL_WINDOWS, "assign": EMAIL_WINDOWS})
+
+def timed_events(kind, df):
+    df = with_timestamps(df, kind)
+    for row in df[df[TIMESTAMP_COLUMN].notna()].to_dict("records"):
+        if shard.owns(row):
+            yield kind, int(row[TIMESTAMP_COLUMN]), row
+
+def refresh_schedule(now_ts, change=None):
+    bucket, start, end = scheduler.horizon(now_ts, HORIZON_SPAN)
+    with STAGE_SECONDS.time(component="email", stage="probe"):
+        versions = {table: table_cache.version(table) for table in VERSIONED_TABLES}
+    signature = (bucket, versions)
+    if not scheduler.needs_reload(signature):
+        SCHEDULE_REFRESHES.inc(component="email", result="unchanged")
+        return
 
-    reminder_windows = {
-        60: (45, 75),
-        30: (20, 40),
-        2:  (0, 5),
-    }
+    # Only the imported cohorts when nothing else changed since the last load
+    cohorts = None
+    if scheduler.signature is not None and scheduler.signature[0] == bucket:
+        cohorts = reload_cohorts(change, scheduler.signature[1], versions)
+
+    # One event row per recipient, already joined in the database
+    with STAGE_SECONDS.time(component="email", stage="query"):
+        frames = [("class", get_classes(start, end, cohorts)), ("assign", get_assignments(start, end, cohorts))]
+    with STAGE_SECONDS.time(component="email", stage="parse"):
+        events = [event for kind, df in frames for event in timed_events(kind, df)]
+
+    with STAGE_SECONDS.time(component="email", stage="schedule"):
+        if cohorts is None:
+            scheduler.load(events, signature, now_ts)
+        else:
+            changed = {cohort_key(*cohort) for cohort in cohorts}
+            scheduler.replace(lambda event: row_cohort(event) in changed, events, signature, now_ts)
+    SCHEDULED.set(len(scheduler), component="email")
+    SCHEDULE_REFRESHES.inc(component="email", result="reloaded" if cohorts is None else "cohorts")
+
+    if cohorts is None:
+        log.info("Schedule loaded", extra={"reminders": len(scheduler), "rows": len(events)})
+    else:
+        log.info("Cohorts reloaded", extra={
+            "cohorts": len(changed), "rows": len(events), "reminders": len(scheduler),
+        })
 
-    students_df = get_students()
+# ============================================================
+# REMINDER LOOP
+# ============================================================
 
-    # ===================== CLASS REMINDERS =====================
-    for _, row in get_classes().iterrows():
-        class_dt = pd.to_datetime(f"{row['date']} {row['time']}", errors="coerce")
-        if pd.isna(class_dt):
-            continue
+def due_recipients(due):
+    """Yields (reminder, student) pairs; each scheduled row is already one recipient."""
+    for reminder in due:
+        yield reminder, {"name": reminder.event["student_name"], "email": reminder.event["student_email"]}
 
-        class_dt = class_dt.replace(tzinfo=IST)
-        minutes_left = (class_dt - now).total_seconds() / 60
-        if minutes_left < 0:
+def enqueue_due(due, sent_reminders, now_ts):
+    jobs = []
+    for reminder, stu in due_recipients(due):
+        key, subject, section = email_item(reminder.kind, reminder.event, reminder.tag, stu)
+        if key in sent_reminders:
             continue
-
-        for m, (lo, hi) in reminder_windows.items():
-            if not (lo <= minutes_left <= hi):
-                continue
-
-            recipients = students_df[
-                (students_df["course"] == row["course"].lower()) &
-                (students_df["batch_name"] == row["batch_name"].upper()) &
-                (students_df["mode"] == row["mode"].lower()) &
-                (students_df["year"].str.contains("2025"))
-            ]
-
-            for _, stu in recipients.iterrows():
-                key = f"class-{row['session_name']}-{row['date']}-{m}-{stu['email']}"
-                if key in sent_reminders:
-                    continue
-
-                send_email(
-                    stu["email"],
-                    f"Class Reminder: {row['session_name']}",
-                    f"Hi {stu['name']},\n\n"
-                    f"📘 Upcoming Class Reminder\n\n"
-                    f"📌 Topic : {row['session_name']}\n"
-                    f"📚 Course: {row['course']}\n"
-                    f"👥 Batch : {row['batch_name']} ({row['mode']})\n"
-                    f"🕒 Starts in {m} minutes\n\n"
-                    f"— Automated Reminder System"
-                )
-
-                mark_sent(key)
-                sent_reminders.add(key)
-
-    # ===================== ASSIGNMENT REMINDERS =====================
-    for _, row in get_assignments().iterrows():
-        raw_due = str(row["due_date"]).replace(".", ":").strip()
-        if len(raw_due) <= 10:
-            raw_due += " 23:59"
-
-        due_dt = pd.to_datetime(raw_due, format="%Y-%m-%d %H:%M", errors="coerce")
-        if pd.isna(due_dt):
+        if is_placeholder(stu["email"]):
+            mark_sent(key)
+            sent_reminders.add(key)
             continue
+        # No point retrying past the end of the reminder's window
+        payload = {"name": stu["name"], "subject": subject, "section": section}
+        jobs.append((key, stu["email"], payload, reminder.expires_at))
 
-        due_dt = due_dt.replace(tzinfo=IST)
-        minutes_left = (due_dt - now).total_seconds() / 60
-        if minutes_left < 0:
-            continue
+    REMINDERS.inc(len(due), channel="email", outcome="due")
+    # already sent, or a placeholder address that is never mailed
+    REMINDERS.inc(len(due) - len(jobs), channel="email", outcome="skipped")
+    with STAGE_SECONDS.time(component="email", stage="enqueue"):
+        return get_outbox().enqueue("email", jobs, now_ts)
 
-        for m, (lo, hi) in reminder_windows.items():
-            if not (lo <= minutes_left <= hi):
-                continue
-
-            recipients = students_df[
-                (students_df["course"] == row["course"]) &
-                (students_df["batch_name"] == row["batch_name"]) &
-                (students_df["mode"] == row["mode"]) &
-                (students_df["year"].str.contains("2025"))
-            ]
-
-            for _, stu in recipients.iterrows():
-                key = f"assign-{row['subject']}-{row['due_date']}-{m}-{stu['email']}"
-                if key in sent_reminders:
-                    continue
-
-                send_email(
-                    stu["email"],
-                    f"Assignment Reminder: {row['subject']}",
-                    f"Hi {stu['name']},\n\n"
-                    f"📝 Assignment Reminder\n\n"
-                    f"📌 Topic : {row['subject']}\n"
-                    f"📚 Course: {row['course'].upper()}\n"
-                    f"👥 Batch : {row['batch_name']} ({row['mode']})\n"
-                    f"⏳ Due in {m} minutes\n\n"
-                    f"— Automated Reminder System"
-                )
+def send_reminders(sent_reminders, change=None):
+    with TICK_SECONDS.time(component="email"):
+        _send_reminders(sent_reminders, change)
 
-                mark_sent(key)
-                sent_reminders.add(key)
+def _send_reminders(sent_reminders, change):
+    now = datetime.now(IST)
+    now_ts = now.timestamp()
+    log.debug("Checking email reminders", extra={"at": f"{now:%Y-%m-%d %H:%M:%S} IST"})
+
+    refresh_schedule(now_ts, change)
+    sent_reminders.expire(now_ts)
+    due = scheduler.due(now_ts, lookahead=DIGEST_WINDOW_SECONDS)
+    dropped = scheduler.dropped
+    REMINDERS.inc(dropped["stale"], channel="email", outcome="expired")
+    REMINDERS.inc(dropped["superseded"], channel="email", outcome="superseded")
+    if dropped["stale"] or dropped["superseded"]:
+        log.info("Dropped reminders", extra={"expired": dropped["stale"], "superseded": dropped["superseded"]})
+    enqueue_due(due, sent_reminders, now_ts)
+    get_checkpoint().save(now_ts)
+
+    box = get_outbox()
+    box.expire(now_ts)
+    handled = 0
+    while True:
+        leased = deliver_batch(sent_reminders, now_ts)
+        handled += leased
+        if leased < OUTBOX_BATCH:
+            break
+    get_sent_store().flush()
+
+    # metrics() runs the depth query (which also refreshes the depth gauge)
+    if (due or handled) and (log.isEnabledFor(logging.INFO) or exporting()):
+        log.info("Outbox", extra=box.metrics())
+
+def seconds_until_next_tick():
+    now_ts = time.time()
+    waits = [RELOAD_INTERVAL, scheduler.seconds_until_next(now_ts)]
+    retry_at = get_outbox().next_attempt()
+    if retry_at is not None:
+        waits.append(retry_at - now_ts)
+    return max(1, min(w for w in waits if w is not None))
 
 # ============================================================
 # RUN (WORKER MODE)
 # ============================================================
 
 if __name__ == "__main__":
-    print("📧 Email Reminder Scheduler Started...")
+    parser = argparse.ArgumentParser(description="Send email reminders")
+    parser.add_argument("--shard", type=int, default=shard.index, help="this worker's shard (0-based)")
+    parser.add_argument("--shards", type=int, default=shard.count, help="number of shards")
+    parser.add_argument("--shard-by", choices=("recipient", "cohort"), default=shard.by)
+    args = parser.parse_args()
+    shard = Shard(args.shard, args.shards, args.shard_by)
+
+    configure_logging()
+    start_exporter()
+    log.info("Email reminder scheduler started", extra={"shard": str(shard)})
     sent_reminders = load_sent()
-
+    get_outbox().purge()
+    scheduler.processed_at = get_checkpoint().load()
+    if scheduler.processed_at is not None:
+        log.info("Catching up", extra={
+            "since": f"{datetime.fromtimestamp(scheduler.processed_at, IST):%Y-%m-%d %H:%M:%S} IST",
+        })
+    # Subscribed before the first load so no import is missed in between
+    changes = PostgresChangeFeed(get_storage()).subscribe()
+
+    change = None
     while True:
-        send_reminders(sent_reminders)
-        time.sleep(30)
+        send_reminders(sent_reminders, change)
+        change = merge_changes(changes.wait(seconds_until_next_tick()))
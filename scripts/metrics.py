@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================================
+# PIPELINE METRICS
+# ============================================================
+# Counters, gauges and histograms kept in process and exposed in the
+# Prometheus text format, either over HTTP or as a file that
+# node_exporter's textfile collector (or a person) can read:
+#
+#   METRICS_PORT=9108            ->  GET http://host:9108/metrics
+#   METRICS_FILE=metrics.prom    ->  rewritten every METRICS_INTERVAL s
+#
+# Recording is a dict update under a lock, cheap enough to leave on
+# whether or not an exporter runs. Labels are passed as keywords:
+#
+#   REMINDERS.inc(3, channel="email", outcome="sent")
+#   with STAGE_SECONDS.time(component="service", stage="query"):
+#       ...
+
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+# Seconds; covers a sub-millisecond cache probe up to a stalled SMTP server
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"❌ {self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self):
+        ...
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines += self._samples()
+        return lines
+
+    def series(self):
+        """Label sets recorded so far, as dicts."""
+        with self._lock:
+            return [dict(zip(self.labelnames, key)) for key in self._values]
+
+    def value(self, **labels):
+        """Current value for one label set (handy in tests and benchmarks)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket counts (cumulated on render), sum, count
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def value(self, **labels):
+        """(count, sum) for one label set."""
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return (0, 0.0) if series is None else (series[2], series[1])
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+# ============================================================
+# REGISTRY
+# ============================================================
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, cls, name, help, labels=(), **kwargs):
+        """Create a metric, or return the existing one of that name."""
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labels):
+                raise ValueError(f"❌ Metric {name} is already registered differently")
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = [line for metric in metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=()):
+    return REGISTRY.register(Counter, name, help, labels)
+
+
+def gauge(name, help, labels=()):
+    return REGISTRY.register(Gauge, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram, name, help, labels, buckets=buckets)
+
+
+# ------------------------------------------------------------
+# Shared by the schedulers, the service and the importers
+# ------------------------------------------------------------
+# component: service | email | discord | import
+
+TICK_SECONDS = histogram(
+    "reminder_tick_seconds", "Duration of one scheduler tick", ["component"])
+STAGE_SECONDS = histogram(
+    "reminder_stage_seconds", "Time spent per pipeline stage", ["component", "stage"])
+REMINDERS = counter(
+    "reminder_reminders_total", "Reminders by outcome (due, skipped, retried, sent, failed, expired, superseded)",
+    ["channel", "outcome"])
+SEND_SECONDS = histogram(
+    "reminder_send_seconds", "Latency of one delivery (an SMTP message or a Discord post)", ["channel"])
+SCHEDULE_REFRESHES = counter(
+    "reminder_schedule_refreshes_total",
+    "Schedule refreshes by result: unchanged (the version probe matched), reloaded or cohorts (partial reload)",
+    ["component", "result"])
+SCHEDULED = gauge(
+    "reminder_scheduled", "Reminders waiting in the scheduler heap", ["component"])
+IMPORT_ROWS = counter(
+    "reminder_import_rows_total", "Rows written by the importers", ["table", "change"])
+
+
+# ============================================================
+# EXPORTERS
+# ============================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="0.0.0.0", registry=REGISTRY):
+    """Serve /metrics from a daemon thread; returns the server (server_address has the port)."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, int(port)), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_file(path, registry=REGISTRY):
+    """Write the current metrics to `path` atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+class FileExporter:
+    def __init__(self, path, interval=METRICS_INTERVAL, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_file(self.path, self.registry)
+
+    def stop(self):
+        self._stop.set()
+        write_file(self.path, self.registry)
+
+
+_exporters = []
+
+
+def exporting():
+    """Whether an exporter runs, i.e. whether values worth a query to refresh are read."""
+    return bool(_exporters)
+
+
+def flush_exporters():
+    """Write file exporters now (short-lived processes call this before exiting)."""
+    for exporter in _exporters:
+        if isinstance(exporter, FileExporter):
+            write_file(exporter.path, exporter.registry)
+
+
+def start_exporter():
+    """Start whichever exporters METRICS_PORT / METRICS_FILE ask for (once per process)."""
+    if _exporters:
+        return _exporters
+    if METRICS_PORT:
+        _exporters.append(serve(METRICS_PORT))
+    if METRICS_FILE:
+        _exporters.append(FileExporter(METRICS_FILE).start())
+    return _exporters
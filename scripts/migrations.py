@@ -0,0 +1,241 @@
+import argparse
+import logging
+
+import storage
+from logs import configure_logging
+from storage import INDEXES, SCHEMA, SQLiteStorage
+
+log = logging.getLogger("reminders.migrations")
+
+# ============================================================
+# SQLITE SCHEMA MIGRATIONS
+# ============================================================
+# The schema version lives in PRAGMA user_version. migrate() applies
+# every step above it in order, each in its own transaction, so an
+# existing reminders.db is upgraded in place and a new one is built
+# from scratch by the same steps. Append new steps; never edit one
+# that has shipped.
+#
+# Each step's DDL is written out here as it shipped, not derived from
+# storage.SCHEMA / storage.INDEXES: those describe the current schema
+# (PostgresStorage builds from them) and editing them must not change
+# what an old step does. schema_drift() checks that the steps still
+# add up to them. Connections get their pragmas (WAL,
+# synchronous=NORMAL, ...) from storage.
+
+DEFAULT_DB_PATH = storage.DEFAULT_DB_PATH
+
+
+def connect(db_path):
+    return SQLiteStorage(db_path).dedicated()
+
+
+# ----------------------------------------------------------
+# Steps
+# ----------------------------------------------------------
+
+def _base_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS students (
+        student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        discord_id TEXT,
+        course TEXT NOT NULL,
+        batch_name TEXT,
+        year INTEGER,
+        mode TEXT
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS classes (
+        class_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course TEXT NOT NULL,
+        batch_name TEXT,
+        year INTEGER,
+        mode TEXT,
+        session_name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS assignments (
+        assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course TEXT NOT NULL,
+        batch_name TEXT,
+        year INTEGER,
+        mode TEXT,
+        subject TEXT NOT NULL,
+        due_date TEXT NOT NULL
+    );
+    """)
+
+
+def _event_timestamps(conn):
+    for table in ("classes", "assignments"):
+        columns = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        if "starts_at_utc" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN starts_at_utc INTEGER")
+
+
+def _version_triggers(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    for table in ("students", "classes", "assignments"):
+        conn.execute(
+            "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+            (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END;
+            """)
+
+
+def _indexes(conn):
+    for table in ("students", "classes", "assignments"):
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_cohort_idx "
+            f"ON {table} (course, batch_name, year, mode)"
+        )
+    for table in ("classes", "assignments"):
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_starts_at_idx ON {table} (starts_at_utc)"
+        )
+
+
+def _student_cohort_norm_index(conn):
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS students_cohort_norm_idx ON students "
+        "(lower(trim(course)), upper(trim(batch_name)), year, lower(trim(mode)))"
+    )
+
+
+MIGRATIONS = [
+    (1, "base tables", _base_tables),
+    (2, "starts_at_utc on classes and assignments", _event_timestamps),
+    (3, "table_versions triggers", _version_triggers),
+    (4, "cohort and event-time indexes", _indexes),
+    (5, "normalised student cohort index", _student_cohort_norm_index),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations. Returns the list of versions applied."""
+    conn.commit()
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log.info("Migrated schema", extra={"version": version, "migration": description})
+        applied.append(version)
+
+    # refresh planner statistics once indexes exist
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
+
+def schema_drift(conn):
+    """Differences between the migrated tables/indexes and storage.SCHEMA/INDEXES."""
+    problems = []
+    for table, columns in SCHEMA.items():
+        expected = [name for name, _ in columns]
+        actual = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if actual != expected:
+            problems.append(f"{table} has columns {actual}, storage.SCHEMA says {expected}")
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for name, _, _ in INDEXES:
+        if name not in indexes:
+            problems.append(f"index {name} is in storage.INDEXES but no migration creates it")
+    return problems
+
+
+# ----------------------------------------------------------
+# Query-plan checks
+# ----------------------------------------------------------
+# The lookups the importer and notifiers run, with the index each one
+# must use. check_query_plans() returns the ones that would scan.
+
+PLANNED_QUERIES = [
+    ("students of a cohort",
+     "SELECT * FROM students WHERE course=? AND batch_name=? AND year=? AND mode=?",
+     ("DSA", "B1", 2025, "Online"), "students_cohort_idx"),
+    ("classes of a cohort",
+     "SELECT * FROM classes WHERE course=? AND batch_name=? AND year=?",
+     ("DSA", "B1", 2025), "classes_cohort_idx"),
+    ("assignments of a cohort",
+     "SELECT * FROM assignments WHERE course=? AND batch_name=? AND year=?",
+     ("DSA", "B1", 2025), "assignments_cohort_idx"),
+    ("classes starting soon",
+     "SELECT * FROM classes WHERE starts_at_utc BETWEEN ? AND ?",
+     (0, 4500), "classes_starts_at_idx"),
+    ("assignments due soon",
+     "SELECT * FROM assignments WHERE starts_at_utc BETWEEN ? AND ?",
+     (0, 4500), "assignments_starts_at_idx"),
+]
+
+
+def query_plan(conn, sql, params=()):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_scans(plan):
+    """Plan steps that read a whole table or index (a VALUES list is fine)."""
+    return [step for step in plan if step.startswith("SCAN ") and "CONSTANT ROW" not in step]
+
+
+def check_query_plans(conn, queries=PLANNED_QUERIES):
+    """Return [(name, plan)] for every query that does not use its expected index."""
+    failures = []
+    for name, sql, params, index in queries:
+        plan = query_plan(conn, sql, params)
+        if not any(f"INDEX {index}" in step for step in plan):
+            failures.append((name, plan))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade a reminders database to the current schema")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--check", action="store_true", help="verify query plans use the indexes")
+    args = parser.parse_args()
+
+    configure_logging()
+    conn = connect(args.db)
+    migrate(conn)
+    log.info("Schema up to date", extra={"db": args.db, "version": schema_version(conn)})
+
+    if args.check:
+        drift = schema_drift(conn)
+        for problem in drift:
+            log.error("Schema drift", extra={"problem": problem})
+        failures = check_query_plans(conn)
+        for name, plan in failures:
+            log.error("Query plan misses its index", extra={"query": name, "plan": " / ".join(plan)})
+        if drift or failures:
+            raise SystemExit(1)
+        log.info("Query plans use their indexes", extra={"queries": len(PLANNED_QUERIES)})
+    conn.close()
@@ -0,0 +1,260 @@
+import json
+import os
+import random
+import socket
+import time
+from collections import Counter
+
+from metrics import counter, gauge
+from storage import column_type
+
+# ============================================================
+# DURABLE OUTBOX
+# ============================================================
+# Every due reminder is written to the outbox table before anything
+# is sent, and delivery works off that table:
+#
+#   enqueue  : one row per reminder key (job_key is unique, so
+#              re-enqueueing after a restart or from another worker
+#              is a no-op)
+#   dequeue  : a batch of ready rows is leased to one worker in a
+#              single UPDATE ... RETURNING (SKIP LOCKED on Postgres)
+#   ack/fail : sent rows are closed; failed rows are retried with
+#              exponential backoff and jitter, and given up on once
+#              the next attempt would land past their deadline - the
+#              end of the reminder's window, so a "starts in 2
+#              minutes" is never delivered after the class started
+#
+# A worker that dies holding a lease loses it after OUTBOX_LEASE
+# seconds and the rows go back to the queue.
+#
+# Row counts (Outbox.metrics()) also go to the process metrics as
+# reminder_outbox_rows_total / reminder_outbox_depth.
+
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "200"))
+OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", "300"))
+BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "15"))
+BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# Rows per multi-row INSERT (well under SQLite's variable limit)
+ENQUEUE_CHUNK = 500
+
+PENDING, SENT, EXPIRED = "pending", "sent", "expired"
+
+# Dequeue must not hand one row to two Postgres workers at once;
+# SQLite serializes writers, so the plain UPDATE is already atomic
+ROW_LOCK = {"postgres": " FOR UPDATE SKIP LOCKED"}
+
+OUTBOX_ROWS = counter("reminder_outbox_rows_total", "Outbox rows by event", ["event"])
+OUTBOX_DEPTH = gauge("reminder_outbox_depth", "Pending outbox rows", ["channel"])
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff(attempts, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Delay before retry number `attempts`: exponential, capped, with half of it jittered."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class Outbox:
+    def __init__(self, storage, worker=None, lease=OUTBOX_LEASE,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 retention=OUTBOX_RETENTION_DAYS * 86400):
+        self.storage = storage
+        self.worker = worker or worker_id()
+        self.lease = lease
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retention = retention
+        self.counters = Counter()
+        self.started = time.time()
+        self._created = False
+
+    def _count(self, event, n):
+        self.counters[event] += n
+        OUTBOX_ROWS.inc(n, event=event)
+
+    def _run(self, fn):
+        conn = self.storage.connection()
+        try:
+            with conn:
+                return fn(conn)
+        finally:
+            conn.close()
+
+    def create_table(self):
+        if self._created:
+            return
+        dialect = self.storage.dialect
+        epoch = column_type("epoch", dialect)
+
+        def create(conn):
+            if dialect == "postgres":
+                # concurrent CREATE TABLE IF NOT EXISTS races on the
+                # SERIAL sequence; channels enqueue in parallel
+                conn.execute("SELECT pg_advisory_xact_lock(hashtext('outbox'))")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                f"outbox_id {column_type('id', dialect)}, "
+                "channel TEXT NOT NULL, job_key TEXT NOT NULL UNIQUE, "
+                "target TEXT NOT NULL, payload TEXT NOT NULL, "
+                f"deadline {epoch} NOT NULL, next_attempt_at {epoch} NOT NULL, "
+                f"attempts INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT '{PENDING}', "
+                f"worker TEXT, lease_until {epoch}, last_error TEXT, "
+                f"enqueued_at {epoch}, sent_at {epoch})"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_ready_idx "
+                "ON outbox (status, channel, next_attempt_at)"
+            )
+        self._run(create)
+        self._created = True
+
+    # --- producer ----------------------------------------------------------
+
+    def enqueue(self, channel, jobs, now=None):
+        """Queue (job_key, target, payload, deadline) jobs; returns the keys that were new."""
+        self.create_table()
+        now = int(time.time() if now is None else now)
+        jobs = list({job[0]: job for job in jobs}.values())
+        added = []
+
+        def insert(conn, chunk):
+            values = ", ".join("(?, ?, ?, ?, ?, ?, ?)" for _ in chunk)
+            params = [
+                p
+                for key, target, payload, deadline in chunk
+                for p in (channel, key, target, json.dumps(payload, default=str), int(deadline), now, now)
+            ]
+            cur = conn.execute(
+                "INSERT INTO outbox (channel, job_key, target, payload, deadline, next_attempt_at, enqueued_at) "
+                f"VALUES {values} ON CONFLICT (job_key) DO NOTHING RETURNING job_key",
+                params,
+            )
+            added.extend(row[0] for row in cur.fetchall())
+
+        for i in range(0, len(jobs), ENQUEUE_CHUNK):
+            self._run(lambda conn: insert(conn, jobs[i:i + ENQUEUE_CHUNK]))
+        self._count("enqueued", len(added))
+        return added
+
+    # --- consumer ----------------------------------------------------------
+
+    def expire(self, now=None):
+        """Give up on pending rows whose deadline has passed."""
+        self.create_table()
+        now = int(time.time() if now is None else now)
+        expired = self._run(lambda conn: conn.execute(
+            f"UPDATE outbox SET status = '{EXPIRED}', lease_until = NULL "
+            f"WHERE status = '{PENDING}' AND deadline < ?", (now,)
+        ).rowcount)
+        self._count("expired", max(expired, 0))
+        return expired
+
+    def dequeue(self, channel, limit=OUTBOX_BATCH, now=None):
+        """Lease up to `limit` ready rows of `channel` to this worker, earliest deadline first.
+
+        After a backlog (downtime, a slow tick) the reminders of the closest
+        events go out first.
+
+        Returns dicts with outbox_id, job_key, target, payload, attempts, deadline.
+        """
+        self.create_table()
+        now = int(time.time() if now is None else now)
+        lock = ROW_LOCK.get(self.storage.dialect, "")
+
+        def lease(conn):
+            cur = conn.execute(
+                "UPDATE outbox SET worker = ?, lease_until = ? WHERE outbox_id IN ("
+                "SELECT outbox_id FROM outbox "
+                f"WHERE status = '{PENDING}' AND channel = ? AND next_attempt_at <= ? "
+                "AND deadline >= ? AND (lease_until IS NULL OR lease_until < ?) "
+                f"ORDER BY deadline, outbox_id LIMIT ?{lock}) "
+                "RETURNING outbox_id, job_key, target, payload, attempts, deadline",
+                (self.worker, now + self.lease, channel, now, now, now, limit),
+            )
+            return cur.fetchall()
+
+        rows = [
+            {"outbox_id": r[0], "job_key": r[1], "target": r[2], "payload": json.loads(r[3]),
+             "attempts": r[4], "deadline": r[5]}
+            for r in self._run(lease)
+        ]
+        rows.sort(key=lambda row: (row["deadline"], row["outbox_id"]))
+        return rows
+
+    def ack(self, rows, now=None):
+        if not rows:
+            return
+        sent_at = int(time.time() if now is None else now)
+        self._run(lambda conn: conn.executemany(
+            f"UPDATE outbox SET status = '{SENT}', sent_at = ?, lease_until = NULL "
+            "WHERE outbox_id = ? AND worker = ?",
+            [(sent_at, row["outbox_id"], self.worker) for row in rows],
+        ))
+        self._count("sent", len(rows))
+
+    def fail(self, rows, error, now=None):
+        """Schedule one delivery's rows for a retry with backoff, or expire those that would miss their deadline."""
+        if not rows:
+            return
+        now = time.time() if now is None else now
+        # One retry time for the whole group, so a digest stays together
+        attempts = max(row["attempts"] for row in rows) + 1
+        retry_at = int(now + backoff(attempts, self.backoff_base, self.backoff_max))
+        updates = []
+        for row in rows:
+            attempts = row["attempts"] + 1
+            status = PENDING if retry_at <= row["deadline"] else EXPIRED
+            self._count("retried" if status == PENDING else "expired", 1)
+            updates.append((attempts, retry_at, status, str(error)[:500], row["outbox_id"], self.worker))
+
+        self._run(lambda conn: conn.executemany(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ?, status = ?, last_error = ?, "
+            "lease_until = NULL WHERE outbox_id = ? AND worker = ?",
+            updates,
+        ))
+        self._count("failed", len(rows))
+
+    # --- housekeeping / metrics ------------------------------------------
+
+    def next_attempt(self):
+        """Epoch of the earliest pending row, or None when the queue is empty."""
+        self.create_table()
+        row = self._run(lambda conn: conn.execute(
+            f"SELECT min(next_attempt_at) FROM outbox WHERE status = '{PENDING}'"
+        ).fetchone())
+        return row[0]
+
+    def depth(self):
+        """Pending rows per channel."""
+        self.create_table()
+        rows = self._run(lambda conn: conn.execute(
+            f"SELECT channel, count(*) FROM outbox WHERE status = '{PENDING}' GROUP BY channel"
+        ).fetchall())
+        depth = dict(rows)
+        # channels that drained to zero keep reporting 0
+        for channel in set(depth) | {labels["channel"] for labels in OUTBOX_DEPTH.series()}:
+            OUTBOX_DEPTH.set(depth.get(channel, 0), channel=channel)
+        return depth
+
+    def metrics(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        return {
+            **{name: self.counters[name] for name in ("enqueued", "sent", "failed", "retried", "expired")},
+            "depth": self.depth(),
+            "sent_per_second": round(self.counters["sent"] / elapsed, 2),
+        }
+
+    def purge(self, now=None):
+        """Drop finished rows older than the retention window."""
+        self.create_table()
+        cutoff = int(time.time() if now is None else now) - self.retention
+        return self._run(lambda conn: conn.execute(
+            f"DELETE FROM outbox WHERE status <> '{PENDING}' AND coalesce(sent_at, deadline) < ?",
+            (cutoff,),
+        ).rowcount)
@@ -0,0 +1,165 @@
+from functools import lru_cache
+
+from templates import Template, encode_html, encode_text, html_bytes, text_bytes
+
+# ============================================================
+# REMINDER WINDOWS AND MESSAGES
+# ============================================================
+# What each channel sends and when, kept free of any I/O so the
+# standalone notifiers and the combined service share one copy.
+# A window (tag, lo, hi) reminds while the event is lo..hi minutes
+# away (see reminder_scheduler).
+
+# Rendered (subject, section) pairs kept per event and window
+RENDER_CACHE = 8192
+
+# ------------------------------------------------------------
+# EMAIL
+# ------------------------------------------------------------
+
+EMAIL_WINDOWS = [
+    (60, 45, 75),
+    (30, 20, 40),
+    (2,  0, 5),
+]
+
+FOOTER = "— Automated Reminder System"
+
+
+def is_placeholder(recipient):
+    return "@example.com" in recipient.lower()
+
+
+# The part of an email shared by every student of the event's
+# cohort is rendered once per (event, window) and reused
+CLASS_SUBJECT = Template("Class Reminder: {session_name}")
+CLASS_SECTION = Template(
+    "📘 Upcoming Class Reminder\n\n"
+    "📌 Topic : {session_name}\n"
+    "📚 Course: {course}\n"
+    "👥 Batch : {batch_name} ({mode})\n"
+    "🕒 Starts in {m} minutes"
+)
+ASSIGNMENT_SUBJECT = Template("Assignment Reminder: {subject}")
+ASSIGNMENT_SECTION = Template(
+    "📝 Assignment Reminder\n\n"
+    "📌 Topic : {subject}\n"
+    "📚 Course: {course}\n"
+    "👥 Batch : {batch_name} ({mode})\n"
+    "⏳ Due in {m} minutes"
+)
+
+
+@lru_cache(maxsize=RENDER_CACHE)
+def _class_text(session_name, course, batch_name, mode, m):
+    values = {"session_name": session_name, "course": course, "batch_name": batch_name, "mode": mode, "m": m}
+    return CLASS_SUBJECT.render(values), CLASS_SECTION.render(values)
+
+
+@lru_cache(maxsize=RENDER_CACHE)
+def _assignment_text(subject, course, batch_name, mode, m):
+    values = {"subject": subject, "course": course.upper(), "batch_name": batch_name, "mode": mode, "m": m}
+    return ASSIGNMENT_SUBJECT.render(values), ASSIGNMENT_SECTION.render(values)
+
+
+def class_item(row, m, stu):
+    subject, section = _class_text(row["session_name"], row["course"], row["batch_name"], row["mode"], m)
+    return (f"class-{row['session_name']}-{row['date']}-{m}-{stu['email']}", subject, section)
+
+
+def assignment_item(row, m, stu):
+    subject, section = _assignment_text(row["subject"], row["course"], row["batch_name"], row["mode"], m)
+    return (f"assign-{row['subject']}-{row['due_date']}-{m}-{stu['email']}", subject, section)
+
+
+def email_item(kind, row, m, stu):
+    """(key, subject, section) for one reminder to one student."""
+    return (class_item if kind == "class" else assignment_item)(row, m, stu)
+
+
+def build_job(stu, items):
+    """One email per recipient per tick: a digest when several reminders coincide."""
+    keys = [key for key, _, _ in items]
+    if len(items) == 1:
+        _, subject, section = items[0]
+        body = f"Hi {stu['name']},\n\n{section}\n\n{FOOTER}"
+    else:
+        subject = f"{len(items)} Upcoming Reminders"
+        sections = "\n\n".join(section for _, _, section in items)
+        body = f"Hi {stu['name']},\n\n{sections}\n\n{FOOTER}"
+    return (keys, stu["email"], subject, body)
+
+
+SECTION_BREAK = text_bytes("\n\n")
+TEXT_FOOTER = text_bytes(f"\n\n{FOOTER}")
+HTML_FOOTER = html_bytes(f"\n\n{FOOTER}")
+
+
+def prepare_job(layout, stu, items):
+    """Like build_job, as pre-encoded MIME (templates.MimeLayout): returns (keys, PreparedMessage)."""
+    keys = [key for key, _, _ in items]
+    subject = items[0][1] if len(items) == 1 else f"{len(items)} Upcoming Reminders"
+
+    greeting = f"Hi {stu['name']},\n\n"
+    text = [encode_text(greeting)]
+    for i, (_, _, section) in enumerate(items):
+        if i:
+            text.append(SECTION_BREAK)
+        text.append(text_bytes(section))
+    text.append(TEXT_FOOTER)
+
+    markup = ()
+    if layout.html:
+        markup = [encode_html(greeting)]
+        for i, (_, _, section) in enumerate(items):
+            if i:
+                markup.append(b"<br>\r\n<br>\r\n")
+            markup.append(html_bytes(section))
+        markup.append(HTML_FOOTER)
+
+    return keys, layout.message(stu["email"], subject, text, markup)
+
+
+# ------------------------------------------------------------
+# DISCORD
+# ------------------------------------------------------------
+
+CLASS_WINDOWS = [
+    ("60", 45, 75),
+    ("30", 20, 40),
+    ("2",  0, 5),
+]
+ASSIGNMENT_WINDOWS = [(m, m - 10, m + 10) for m in (60, 30, 15)]
+
+CLASS_TITLES = {
+    "60": "⏰ **Class Reminder (1 Hour Left)**",
+    "30": "⏰ **Class Reminder (30 Minutes Left)**",
+    "2":  "🚀 **Class Starting Soon**",
+}
+
+# Between reminders packed into one Discord message
+DIGEST_SEPARATOR = "\n\n———\n\n"
+
+
+def discord_text(kind, tag, row):
+    if kind == "class":
+        return (
+            f"{CLASS_TITLES[tag]}\n\n"
+            f"📘 {row['session_name']}\n"
+            f"📚 {row['course']}\n"
+            f"👥 {row['batch_name']} {row['year']} ({row['mode']})\n"
+            f"🕒 Starts at {row['time']}"
+        )
+    return (
+        f"📝 **Assignment Reminder**\n\n"
+        f"📌 {row['subject']}\n"
+        f"📚 {row['course']}\n"
+        f"👥 {row['batch_name']} {row['year']} ({row['mode']})\n"
+        f"⏳ {tag} minutes remaining"
+    )
+
+
+def discord_key(kind, tag, row, channel_id):
+    if kind == "class":
+        return f"class-{tag}-{row['session_name']}-{row['date']}-{channel_id}"
+    return f"assign-{row['subject']}-{row['due_date']}-{tag}-{channel_id}"
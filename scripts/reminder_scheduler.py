@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import os
+from collections import Counter, namedtuple
+
+# ============================================================
+# TIME-INDEXED REMINDER SCHEDULER
+# ============================================================
+# Each event's reminder fire times are computed once, when the
+# source data is loaded, and kept in a min-heap keyed by fire time.
+# A tick only pops what is due, so its cost is O(due reminders)
+# rather than O(events x windows).
+#
+# A window (tag, lo, hi) means "remind while the event is between
+# lo and hi minutes away": the reminder fires at event - hi and
+# expires at event - lo, plus `grace` seconds (never past the event
+# itself) so a late tick can still send it.
+#
+# Catch-up: the scheduler remembers the last instant it processed
+# (callers persist it, see checkpoint.py). Loads keep every reminder
+# still open at that instant but not yet fired, so after downtime or a
+# slow tick the next due() sees everything that fired in between, and
+# nothing it already returned. Reminders put back with retry() outlive
+# reloads until they are due again. Of what fired, reminders still
+# open are returned closest event first, the rest are dropped and
+# counted as stale, and an event's older reminder is dropped when a
+# newer window of the same event is due too.
+
+# Seconds a reminder stays deliverable after its window closes
+CATCHUP_GRACE = int(os.getenv("CATCHUP_GRACE_MINUTES", "5")) * 60
+
+Reminder = namedtuple(
+    "Reminder", ["fire_at", "expires_at", "event_at", "kind", "tag", "event"]
+)
+
+
+class ReminderScheduler:
+    def __init__(self, windows, grace=CATCHUP_GRACE):
+        # windows: {kind: [(tag, lo_minutes, hi_minutes), ...]}
+        self.windows = windows
+        self.grace = grace
+        self.signature = None
+        self.processed_at = None
+        # latest fire time due() has popped (now + lookahead); not
+        # persisted, so a restart falls back to processed_at
+        self.fired_through = None
+        # reminders dropped by the last due() call: {reason: n} and
+        # {(reason, kind): n}, reason being "stale" or "superseded"
+        self.dropped = Counter()
+        self.dropped_by_kind = Counter()
+        self._heap = []
+        self._seq = itertools.count()
+        # sequence numbers of heap entries pushed by retry()
+        self._retries = set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def needs_reload(self, signature):
+        return signature != self.signature
+
+    def horizon(self, now, span):
+        """Return (bucket, start, end) for loading only nearby events.
+
+        Reloading whenever `bucket` changes and loading events that start
+        in [start, end) covers every reminder that can fire before then.
+        """
+        reach = max((hi for windows in self.windows.values() for _, _, hi in windows), default=0) * 60
+        bucket = int(now // span)
+        return bucket, self._since(now), (bucket + 2) * span + reach
+
+    def _since(self, now):
+        """Reminders open at this instant are (re)loaded: the last processed one, if earlier."""
+        if self.processed_at is None:
+            return now
+        return min(self.processed_at, now)
+
+    def _entries(self, events, now):
+        since = self._since(now)
+        fired = self.processed_at if self.fired_through is None else self.fired_through
+        for kind, event_at, event in events:
+            for tag, lo, hi in self.windows.get(kind, ()):
+                closes_at = event_at - lo * 60
+                expires_at = max(closes_at, min(closes_at + self.grace, event_at))
+                fire_at = event_at - hi * 60
+                if expires_at < since or (fired is not None and fire_at <= fired):
+                    continue
+                reminder = Reminder(fire_at, expires_at, event_at, kind, tag, event)
+                yield reminder.fire_at, next(self._seq), reminder
+
+    def load(self, events, signature, now):
+        """Rebuild the heap from (kind, event_at_epoch, event) tuples."""
+        heap = [entry for entry in self._heap if entry[1] in self._retries]
+        heap.extend(self._entries(events, now))
+        heapq.heapify(heap)
+        self._heap = heap
+        self.signature = signature
+
+    def replace(self, match, events, signature, now):
+        """Swap the reminders whose event satisfies match(event) for those of `events`."""
+        heap = [entry for entry in self._heap if entry[1] in self._retries or not match(entry[2].event)]
+        heap.extend(self._entries(events, now))
+        heapq.heapify(heap)
+        self._heap = heap
+        self.signature = signature
+
+    def due(self, now, lookahead=0):
+        """Pop every reminder firing by `now + lookahead`, closest event first.
+
+        Expired reminders and ones superseded by a newer window of the same
+        event are dropped and counted in self.dropped.
+        """
+        latest, dropped = {}, Counter()
+        while self._heap and self._heap[0][0] <= now + lookahead:
+            _, seq, reminder = heapq.heappop(self._heap)
+            self._retries.discard(seq)
+            if reminder.expires_at < now:
+                dropped["stale", reminder.kind] += 1
+                continue
+            key = (reminder.kind, reminder.event_at, id(reminder.event))
+            if key in latest:
+                dropped["superseded", reminder.kind] += 1
+            if key not in latest or reminder.fire_at > latest[key].fire_at:
+                latest[key] = reminder
+
+        self.dropped_by_kind = dropped
+        self.dropped = Counter()
+        for (reason, _), n in dropped.items():
+            self.dropped[reason] += n
+        self.processed_at = now
+        self.fired_through = now + lookahead
+        return sorted(latest.values(), key=lambda reminder: (reminder.event_at, reminder.fire_at))
+
+    def retry(self, reminder, at):
+        """Put a reminder back for another attempt if its window is still open."""
+        if at <= reminder.expires_at:
+            seq = next(self._seq)
+            self._retries.add(seq)
+            heapq.heappush(self._heap, (at, seq, reminder._replace(fire_at=at)))
+
+    def seconds_until_next(self, now):
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
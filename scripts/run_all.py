@@ -5,16 +5,7 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PYTHON = sys.executable  # uses venv python automatically
 
-discord_script = os.path.join(BASE_DIR, "scripts", "discord_notifier.py")
-email_script = os.path.join(BASE_DIR, "scripts", "mail_scheduler.py")
+# Discord and email reminders run as channels of one service process
+service_script = os.path.join(BASE_DIR, "scripts", "service.py")
 
-# Start Discord bot
-subprocess.Popen([PYTHON, discord_script])
-
-# Start Email scheduler
-subprocess.Popen([PYTHON, email_script])
-
-# Keep the launcher alive
-import time
-while True:
-    time.sleep(60)
+sys.exit(subprocess.run([PYTHON, service_script]).returncode)
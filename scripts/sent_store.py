@@ -0,0 +1,384 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from dedup import PG_DIGEST_SQL, SENT_HORIZON_DAYS, DigestSet, digest
+from sharding import Shard
+
+# ============================================================
+# SENT REMINDER STORES
+# ============================================================
+# Keys are appended (and fsynced) to a local journal the moment a
+# reminder is delivered, buffered in memory, and written to the
+# database in one multi-row INSERT per flush. On startup the journal
+# is replayed, so keys that never reached the database are still
+# known and nothing is re-sent after a crash.
+#
+# Each row also stores the key's 64-bit digest; startup reads only the
+# digests sent within the dedup horizon into a compact DigestSet.
+#
+# A journal belongs to one process: flush() truncates it, which would
+# drop keys another process has journaled but not flushed yet. Each
+# email shard gets its own default path, and a lock file stops two
+# processes (say, replicas of one shard) from sharing a journal.
+
+SENT_JOURNAL_PATH = os.getenv("SENT_JOURNAL_PATH")
+SENT_FLUSH_EVERY = int(os.getenv("SENT_FLUSH_EVERY", "500"))
+
+
+def default_journal_path(shard=None):
+    """SENT_JOURNAL_PATH, else one journal per email shard (default: EMAIL_SHARD / EMAIL_SHARDS)."""
+    if SENT_JOURNAL_PATH:
+        return SENT_JOURNAL_PATH
+    shard = shard or Shard.from_env()
+    if shard.count == 1:
+        return "sent_email_reminders.wal"
+    return f"sent_email_reminders.{shard.index}-of-{shard.count}.wal"
+
+
+class SentStore(ABC):
+    """Buffered, journaled persistence for delivered reminder keys."""
+
+    def __init__(self, journal_path=None, flush_every=SENT_FLUSH_EVERY,
+                 horizon=SENT_HORIZON_DAYS * 86400):
+        self.journal_path = journal_path or default_journal_path()
+        self.flush_every = flush_every
+        self.horizon = horizon
+        self._pending = []
+        self._lock = threading.Lock()
+        self._journal = None
+        self._journal_lock = None
+
+    # --- backend hooks -------------------------------------------------
+
+    @abstractmethod
+    def _create_table(self):
+        ...
+
+    @abstractmethod
+    def _load_keys(self, since):
+        """Yield integer (reminder_digest, sent_at_epoch) rows sent at or after `since`."""
+
+    @abstractmethod
+    def _insert_keys(self, keys):
+        ...
+
+    def _close_backend(self):
+        pass
+
+    # --- journal ---------------------------------------------------------
+
+    def _lock_journal(self):
+        if self._journal_lock is not None or fcntl is None:
+            return
+        lock = open(f"{self.journal_path}.lock", "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            raise RuntimeError(
+                f"❌ Sent journal {self.journal_path} is in use by another process; "
+                "give each worker its own SENT_JOURNAL_PATH"
+            )
+        self._journal_lock = lock
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        with open(self.journal_path, encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
+
+    def _truncate_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        open(self.journal_path, "w").close()
+
+    # --- public API ------------------------------------------------------
+
+    def load(self, now=None):
+        """Return a DigestSet of keys within the horizon, pushing journaled leftovers to the database."""
+        now = time.time() if now is None else now
+        self._lock_journal()
+        self._create_table()
+        keys = DigestSet.from_rows(self._load_keys(now - self.horizon), now=now, horizon=self.horizon)
+
+        leftovers = self._read_journal()
+        if leftovers:
+            with self._lock:
+                self._pending.extend(leftovers)
+            self.flush()
+            keys.update(leftovers)
+
+        return keys
+
+    def add(self, key):
+        with self._lock:
+            journal = self._open_journal()
+            journal.write(key + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+            self._pending.append(key)
+            full = len(self._pending) >= self.flush_every
+
+        if full:
+            self.flush()
+
+    def import_keys(self, keys):
+        """Write keys delivered elsewhere (e.g. a legacy log) straight to the database."""
+        keys = list(dict.fromkeys(keys))
+        if keys:
+            with self._lock:
+                self._insert_keys(keys)
+        return len(keys)
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return 0
+            keys = list(dict.fromkeys(self._pending))
+            self._insert_keys(keys)
+            self._pending = []
+            self._truncate_journal()
+            return len(keys)
+
+    def close(self):
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._journal_lock is not None:
+            self._journal_lock.close()
+            self._journal_lock = None
+        self._close_backend()
+
+
+# ============================================================
+# POSTGRESQL
+# ============================================================
+
+class PostgresSentStore(SentStore):
+    def __init__(self, database_url=None, minconn=1, maxconn=4, pool=None, **kwargs):
+        """Use `pool` (e.g. storage.PostgresStorage.pool) if given, else open one for database_url."""
+        super().__init__(**kwargs)
+        self._owns_pool = pool is None
+        if pool is None:
+            from psycopg2.pool import ThreadedConnectionPool
+
+            pool = ThreadedConnectionPool(minconn, maxconn, database_url)
+        self.pool = pool
+
+    def _run(self, fn):
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    return fn(cur)
+        finally:
+            self.pool.putconn(conn)
+
+    def _create_table(self):
+        def create(cur):
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS sent_reminders ("
+                "reminder_key TEXT PRIMARY KEY, reminder_digest BIGINT, "
+                "sent_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+            cur.execute(
+                "ALTER TABLE sent_reminders "
+                "ADD COLUMN IF NOT EXISTS sent_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+                "ADD COLUMN IF NOT EXISTS reminder_digest BIGINT"
+            )
+            cur.execute(
+                f"UPDATE sent_reminders SET reminder_digest = {PG_DIGEST_SQL} "
+                "WHERE reminder_digest IS NULL"
+            )
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS sent_reminders_sent_at_idx ON sent_reminders (sent_at)"
+            )
+        self._run(create)
+
+    def _load_keys(self, since):
+        # Server-side cursor: rows stream in chunks instead of one big fetchall()
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                with conn.cursor(name="load_sent_reminders") as cur:
+                    cur.itersize = 50_000
+                    cur.execute(
+                        "SELECT reminder_digest, extract(epoch FROM sent_at)::bigint "
+                        "FROM sent_reminders WHERE sent_at >= to_timestamp(%s)",
+                        (since,)
+                    )
+                    yield from cur
+        finally:
+            self.pool.putconn(conn)
+
+    def _insert_keys(self, keys):
+        from psycopg2.extras import execute_values
+
+        self._run(lambda cur: execute_values(
+            cur,
+            "INSERT INTO sent_reminders (reminder_key, reminder_digest) VALUES %s "
+            "ON CONFLICT DO NOTHING",
+            [(k, digest(k)) for k in keys],
+            page_size=1000,
+        ))
+
+    def _close_backend(self):
+        if self._owns_pool:
+            self.pool.closeall()
+
+
+# ============================================================
+# SQLITE
+# ============================================================
+
+class SQLiteSentStore(SentStore):
+    def __init__(self, db_path, **kwargs):
+        super().__init__(**kwargs)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def _create_table(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent_reminders ("
+                "reminder_key TEXT PRIMARY KEY, reminder_digest INTEGER, sent_at INTEGER)"
+            )
+            columns = [r[1] for r in self.conn.execute("PRAGMA table_info(sent_reminders)")]
+            for column in ("reminder_digest", "sent_at"):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE sent_reminders ADD COLUMN {column} INTEGER")
+            self.conn.create_function("reminder_digest", 1, digest, deterministic=True)
+            self.conn.execute(
+                "UPDATE sent_reminders SET "
+                "reminder_digest = coalesce(reminder_digest, reminder_digest(reminder_key)), "
+                "sent_at = coalesce(sent_at, CAST(strftime('%s', 'now') AS INTEGER)) "
+                "WHERE reminder_digest IS NULL OR sent_at IS NULL"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS sent_reminders_sent_at_idx ON sent_reminders (sent_at)"
+            )
+
+    def _load_keys(self, since):
+        return self.conn.execute(
+            "SELECT reminder_digest, sent_at FROM sent_reminders WHERE sent_at >= ?", (since,)
+        )
+
+    def _insert_keys(self, keys):
+        sent_at = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO sent_reminders (reminder_key, reminder_digest, sent_at) "
+                "VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                [(k, digest(k), sent_at) for k in keys],
+            )
+
+    def _close_backend(self):
+        self.conn.close()
+
+
+# ============================================================
+# APPEND-ONLY LOG (DISCORD)
+# ============================================================
+# One "<expires_at>\t<key>" line per delivered reminder, appended and
+# fsynced as it is sent. A key expires `retention` seconds after its
+# event, startup loads only live keys, and the file is compacted
+# (rewritten with live keys only) once dead lines outnumber live ones.
+
+SENT_RETENTION_DAYS = int(os.getenv("SENT_RETENTION_DAYS", "3"))
+
+# discord_notifier.py's log; service.py imports it once into its sent store
+DISCORD_SENT_LOG_PATH = "sent_discord_reminders.log"
+
+
+class AppendOnlySentLog:
+    def __init__(self, path, retention=SENT_RETENTION_DAYS * 86400):
+        self.path = path
+        self.retention = retention
+        self.expires = {}
+        self._lines = 0
+        self._file = None
+
+    def __contains__(self, key):
+        return key in self.expires
+
+    def __len__(self):
+        return len(self.expires)
+
+    def load(self, now):
+        self.expires = {}
+        self._lines = 0
+        legacy = False
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if not line:
+                        continue
+                    self._lines += 1
+                    expires_at, sep, key = line.partition("\t")
+                    if not sep:
+                        # Lines written before expiry tracking existed
+                        key, expires_at = line.strip(), now + self.retention
+                        legacy = True
+                    expires_at = float(expires_at)
+                    if expires_at > now:
+                        self.expires[key] = max(expires_at, self.expires.get(key, 0))
+
+        if legacy:
+            self.compact(now)
+        else:
+            self.compact_if_needed(now)
+        return self
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def add(self, key, event_at):
+        expires_at = event_at + self.retention
+        f = self._open()
+        f.write(f"{expires_at:.0f}\t{key}\n")
+        f.flush()
+        os.fsync(f.fileno())
+        self.expires[key] = expires_at
+        self._lines += 1
+
+    def compact(self, now):
+        self.expires = {k: e for k, e in self.expires.items() if e > now}
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, expires_at in self.expires.items():
+                f.write(f"{expires_at:.0f}\t{key}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._lines = len(self.expires)
+
+    def compact_if_needed(self, now):
+        live = sum(1 for e in self.expires.values() if e > now)
+        if self._lines - live > max(live, 100):
+            self.compact(now)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
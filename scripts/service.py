@@ -0,0 +1,466 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from checkpoint import Checkpoint
+from change_feed import cohort_key, merge_changes, open_feed, reload_cohorts, row_cohort
+from coalesce import DIGEST_WINDOW_SECONDS, coalesce, pack
+from db_cache import VERSIONED_TABLES, PostgresTableCache, SQLiteTableCache
+from event_queries import PostgresEventQueries, SQLiteEventQueries
+from event_times import TIMESTAMP_COLUMN
+from fanout import FanOut
+from logs import configure_logging
+from metrics import REMINDERS, SCHEDULE_REFRESHES, SCHEDULED, STAGE_SECONDS, TICK_SECONDS, exporting, start_exporter
+from outbox import OUTBOX_BATCH, Outbox
+from reminder_messages import (
+    ASSIGNMENT_WINDOWS, CLASS_WINDOWS, DIGEST_SEPARATOR, EMAIL_WINDOWS,
+    discord_key, discord_text, email_item, is_placeholder, prepare_job,
+)
+from reminder_scheduler import ReminderScheduler
+from sent_store import DISCORD_SENT_LOG_PATH, AppendOnlySentLog, PostgresSentStore, SQLiteSentStore
+from sharding import Shard
+from storage import open_storage
+from templates import MimeLayout
+
+# ============================================================
+# UNIFIED REMINDER SERVICE
+# ============================================================
+# Runs the Discord bot and the email sender as channels of one
+# asyncio process. They share one storage pool, one version-probed
+# table cache, one ReminderScheduler (kinds are (channel, kind)
+# pairs) and one sent-key store, so each tick probes the database
+# once and every row is parsed once. Due reminders of every channel
+# go through one durable outbox, which retries failed sends.
+#
+# Blocking work - database reads, SMTP, journal fsyncs - runs in
+# worker threads so the Discord gateway heartbeat never stalls.
+#
+# The importer announces each import on the change feed (see
+# change_feed.py); the service wakes up and reloads just the touched
+# cohorts. Probing table versions every RELOAD_INTERVAL stays as the
+# safety net for other writers, and is the only way changes are
+# noticed where the feed is unavailable (POLL_INTERVAL).
+#
+# The last processed instant is checkpointed every tick; after a
+# restart the first tick catches up on everything that fired while
+# the service was down (see checkpoint.py, reminder_scheduler.py).
+#
+# Tick and stage timings, reminder counts and send latencies are
+# recorded in metrics.py; set METRICS_PORT or METRICS_FILE to export
+# them.
+#
+# A channel is enabled when its credentials are set: SENDER_EMAIL /
+# SENDER_PASS for email, DISCORD_TOKEN for Discord. The database is
+# DATABASE_URL if set, else DB_PATH (see storage.open_storage).
+
+log = logging.getLogger("reminders.service")
+
+# Fallback wake-ups for noticing database changes, with and without
+# the change feed
+RELOAD_INTERVAL = int(os.getenv("RELOAD_INTERVAL", "300"))
+POLL_INTERVAL = 15
+RETRY_DELAY = 30
+
+# Only events whose reminders can fire within the next couple of
+# spans are loaded; the schedule is reloaded every span
+HORIZON_SPAN = 600
+
+
+def event_rows(df):
+    for row in df[df[TIMESTAMP_COLUMN].notna()].to_dict("records"):
+        yield int(row[TIMESTAMP_COLUMN]), row
+
+
+# ============================================================
+# EMAIL CHANNEL
+# ============================================================
+# Channels turn due reminders into outbox jobs - (key, target,
+# payload, deadline) - and send leased outbox rows. Retries,
+# backoff and deadlines are the outbox's job (see outbox.py).
+
+class EmailChannel:
+    name = "email"
+    windows = {"class": EMAIL_WINDOWS, "assign": EMAIL_WINDOWS}
+
+    def __init__(self, sender, password):
+        from smtp_pool import SMTPPool
+
+        self.smtp_pool = SMTPPool(sender, password)
+        self.fan_out = FanOut(self.smtp_pool.send)
+        self.layout = MimeLayout(sender)
+        self.shard = Shard.from_env()
+
+    def load(self, queries, kind, start, end, cohorts=None):
+        # One row per (event, recipient), joined in the database
+        df = queries.upcoming_recipients(kind, start, end, cohorts)
+        if kind == "assign":
+            df["course"] = df["course"].str.strip().str.lower()
+            df["batch_name"] = df["batch_name"].str.strip().str.upper()
+            df["mode"] = df["mode"].fillna("offline").str.strip().str.lower()
+        return ((event_at, row) for event_at, row in event_rows(df) if self.shard.owns(row))
+
+    async def start(self):
+        log.info("Email channel started", extra={"shard": str(self.shard)})
+
+    async def jobs(self, due, sent):
+        """Returns (jobs, keys done without sending, reminders to retry)."""
+        jobs, done = [], []
+        for reminder in due:
+            row = reminder.event
+            stu = {"name": row["student_name"], "email": row["student_email"]}
+            key, subject, section = email_item(reminder.kind[1], row, reminder.tag, stu)
+            if key in sent:
+                continue
+            if is_placeholder(stu["email"]):
+                done.append(key)
+                continue
+            payload = {"name": stu["name"], "subject": subject, "section": section}
+            jobs.append((key, stu["email"], payload, reminder.expires_at))
+        return jobs, done, []
+
+    async def send(self, rows):
+        """Send leased rows; returns [(rows, error or None)] per email."""
+        # One email per recipient: a digest when several reminders are queued
+        groups, jobs = [], []
+        for recipient, group in coalesce(rows, lambda row: row["target"]):
+            stu = {"name": group[0]["payload"]["name"], "email": recipient}
+            items = [(row["job_key"], row["payload"]["subject"], row["payload"]["section"]) for row in group]
+            groups.append(group)
+            jobs.append(prepare_job(self.layout, stu, items))
+
+        started = time.monotonic()
+        results = await asyncio.to_thread(self.fan_out.run, [message for _, message in jobs])
+        elapsed = time.monotonic() - started
+
+        outcomes = []
+        for group, (_, message), result in zip(groups, jobs, results):
+            if not result.ok:
+                log.warning("Email failed", extra={"recipient": message.recipient, "error": result.error})
+            outcomes.append((group, None if result.ok else result.error))
+
+        log.info("Emails sent", extra={
+            "sent": sum(r.ok for r in results), "emails": len(jobs), "seconds": round(elapsed, 3),
+        })
+        return outcomes
+
+    async def close(self):
+        await asyncio.to_thread(self.smtp_pool.close)
+
+
+# ============================================================
+# DISCORD CHANNEL
+# ============================================================
+
+class DiscordChannel:
+    name = "discord"
+    windows = {"class": CLASS_WINDOWS, "assign": ASSIGNMENT_WINDOWS}
+
+    def __init__(self, token):
+        import discord
+
+        from discord_channels import ChannelResolver, disable_ssl_verification
+
+        disable_ssl_verification()
+        self.token = token
+        self.bot = discord.Client(intents=discord.Intents.default())
+        self.resolver = ChannelResolver(self.bot)
+        self.connection = None
+
+    def load(self, queries, kind, start, end, cohorts=None):
+        return event_rows(queries.upcoming(kind, start, end, cohorts))
+
+    async def start(self):
+        await self.bot.login(self.token)
+        self.connection = asyncio.create_task(self.bot.connect())
+        self.connection.add_done_callback(self._connection_closed)
+        ready = asyncio.create_task(self.bot.wait_until_ready())
+        done, _ = await asyncio.wait({self.connection, ready}, return_when=asyncio.FIRST_COMPLETED)
+        if ready not in done:
+            ready.cancel()
+            self.connection.result()  # re-raises why connect() gave up
+            raise RuntimeError("❌ Discord gateway closed before the bot was ready")
+        log.info("Discord logged in", extra={"user": str(self.bot.user)})
+
+    def _connection_closed(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Discord gateway connection failed", extra={"error": task.exception()})
+
+    async def jobs(self, due, sent):
+        jobs = []
+        for reminder in due:
+            channel_id = self.resolver.channel_id(reminder.event)
+            if channel_id is None:
+                # no channel mapped for this cohort (logged once by the
+                # resolver); channels that fail to fetch are retried by
+                # the outbox when send() reports them unavailable
+                continue
+            key = discord_key(reminder.kind[1], reminder.tag, reminder.event, channel_id)
+            if key not in sent:
+                text = discord_text(reminder.kind[1], reminder.tag, reminder.event)
+                jobs.append((key, str(channel_id), {"text": text}, reminder.expires_at))
+        return jobs, [], []
+
+    async def post(self, channel, message):
+        try:
+            await channel.send(message)
+            log.debug("Discord message sent", extra={"channel": channel.name})
+            return None
+        except Exception as e:
+            log.warning("Discord send failed", extra={"channel": channel.name, "error": e})
+            return e
+
+    async def send(self, rows):
+        from discord_channels import dispatch
+
+        # One digest per channel, split to fit Discord's message limit
+        outcomes, messages = [], []
+        for channel_id, group in coalesce(rows, lambda row: row["target"]):
+            channel = await self.resolver.by_id(int(channel_id))
+            if channel is None:
+                outcomes.append((group, "channel unavailable"))
+                continue
+            parts = [(row["payload"]["text"], row) for row in group]
+            for text, payloads in pack(parts, separator=DIGEST_SEPARATOR):
+                messages.append((channel, text, payloads))
+
+        errors = await dispatch([(channel, text) for channel, text, _ in messages], self.post)
+        outcomes.extend((payloads, error) for (_, _, payloads), error in zip(messages, errors))
+        return outcomes
+
+    async def close(self):
+        await self.bot.close()
+
+
+# ============================================================
+# SERVICE
+# ============================================================
+
+class ReminderService:
+    def __init__(self, storage, channels):
+        self.channels = {channel.name: channel for channel in channels}
+
+        if storage.dialect == "sqlite":
+            self.table_cache = SQLiteTableCache(storage.path)
+            self.queries = SQLiteEventQueries(storage.path)
+            self.store = SQLiteSentStore(storage.path)
+        else:
+            self.table_cache = PostgresTableCache(storage.acquire)
+            self.queries = PostgresEventQueries(storage.acquire)
+            self.store = PostgresSentStore(pool=storage.pool)
+        self.outbox = Outbox(storage)
+        self.checkpoint = Checkpoint(storage, "service")
+        self.feed = open_feed(storage)
+        self.subscription = None
+
+        self.scheduler = ReminderScheduler({
+            (channel.name, kind): windows
+            for channel in channels
+            for kind, windows in channel.windows.items()
+        })
+        self.sent = None
+
+    def refresh_schedule(self, now, change=None):
+        bucket, start, end = self.scheduler.horizon(now, HORIZON_SPAN)
+        with STAGE_SECONDS.time(component="service", stage="probe"):
+            versions = {table: self.table_cache.version(table) for table in VERSIONED_TABLES}
+        signature = (bucket, versions)
+        if not self.scheduler.needs_reload(signature):
+            SCHEDULE_REFRESHES.inc(component="service", result="unchanged")
+            return
+
+        loaded = self.scheduler.signature
+        cohorts = None
+        if loaded is not None and loaded[0] == bucket:
+            cohorts = reload_cohorts(change, loaded[1], versions)
+
+        # load() runs the query; iterating its rows is the parsing
+        events = []
+        for channel in self.channels.values():
+            for kind in ("class", "assign"):
+                with STAGE_SECONDS.time(component="service", stage="query"):
+                    rows = channel.load(self.queries, kind, start, end, cohorts)
+                with STAGE_SECONDS.time(component="service", stage="parse"):
+                    events.extend(((channel.name, kind), event_at, row) for event_at, row in rows)
+
+        with STAGE_SECONDS.time(component="service", stage="schedule"):
+            if cohorts is None:
+                self.scheduler.load(events, signature, now)
+            else:
+                changed = {cohort_key(*cohort) for cohort in cohorts}
+                self.scheduler.replace(lambda event: row_cohort(event) in changed, events, signature, now)
+        SCHEDULED.set(len(self.scheduler), component="service")
+        SCHEDULE_REFRESHES.inc(component="service", result="reloaded" if cohorts is None else "cohorts")
+
+        if cohorts is None:
+            log.info("Schedule loaded", extra={"reminders": len(self.scheduler), "rows": len(events)})
+        else:
+            log.info("Cohorts reloaded", extra={
+                "cohorts": len(changed), "rows": len(events), "reminders": len(self.scheduler),
+            })
+
+    def mark_sent(self, keys):
+        for key in keys:
+            self.store.add(key)
+            self.sent.add(key)
+        self.store.flush()
+
+    async def enqueue(self, channel, reminders, now):
+        jobs, done, retry = await channel.jobs(reminders, self.sent)
+        with STAGE_SECONDS.time(component="service", stage="enqueue"):
+            await asyncio.to_thread(self.outbox.enqueue, channel.name, jobs, now)
+        for reminder in retry:
+            self.scheduler.retry(reminder, now + RETRY_DELAY)
+
+        REMINDERS.inc(len(reminders), channel=channel.name, outcome="due")
+        # already sent, or a placeholder address that is never mailed
+        REMINDERS.inc(len(reminders) - len(jobs) - len(retry), channel=channel.name, outcome="skipped")
+        REMINDERS.inc(len(retry), channel=channel.name, outcome="retried")
+        return done
+
+    async def drain(self, channel, now):
+        """Send leased batches until the channel's ready rows run out; returns delivered keys."""
+        delivered = []
+        while True:
+            rows = await asyncio.to_thread(self.outbox.dequeue, channel.name, OUTBOX_BATCH, now)
+            if not rows:
+                return delivered
+
+            acked = []
+            with STAGE_SECONDS.time(component="service", stage=f"send_{channel.name}"):
+                outcomes = await channel.send(rows)
+            for group, error in outcomes:
+                if error is None:
+                    acked.extend(group)
+                else:
+                    REMINDERS.inc(len(group), channel=channel.name, outcome="failed")
+                    await asyncio.to_thread(self.outbox.fail, group, error)
+            await asyncio.to_thread(self.outbox.ack, acked)
+            REMINDERS.inc(len(acked), channel=channel.name, outcome="sent")
+            delivered.extend(row["job_key"] for row in acked)
+
+            if len(rows) < OUTBOX_BATCH:
+                return delivered
+
+    async def tick(self, change=None, now=None):
+        with TICK_SECONDS.time(component="service"):
+            await self._tick(change, time.time() if now is None else now)
+
+    async def _tick(self, change, now):
+        await asyncio.to_thread(self.refresh_schedule, now, change)
+        self.sent.expire(now)
+
+        due = self.scheduler.due(now, lookahead=DIGEST_WINDOW_SECONDS)
+        for (reason, (channel, _)), n in self.scheduler.dropped_by_kind.items():
+            REMINDERS.inc(n, channel=channel, outcome="expired" if reason == "stale" else reason)
+        dropped = self.scheduler.dropped
+        if dropped["stale"] or dropped["superseded"]:
+            log.info("Dropped reminders", extra={"expired": dropped["stale"], "superseded": dropped["superseded"]})
+        done = await asyncio.gather(*(
+            self.enqueue(self.channels[name], reminders, now)
+            for name, reminders in coalesce(due, lambda reminder: reminder.kind[0])
+        ))
+        # Everything up to `now` is in the outbox (or dropped) from here on
+        await asyncio.to_thread(self.checkpoint.save, now)
+
+        await asyncio.to_thread(self.outbox.expire, now)
+        delivered = await asyncio.gather(*(self.drain(channel, now) for channel in self.channels.values()))
+
+        keys = [key for group in done + delivered for key in group]
+        if keys:
+            await asyncio.to_thread(self.mark_sent, keys)
+        # metrics() runs the depth query (which also refreshes the depth gauge)
+        if (due or keys) and (log.isEnabledFor(logging.INFO) or exporting()):
+            log.info("Outbox", extra=await asyncio.to_thread(self.outbox.metrics))
+
+    def seconds_until_next_tick(self):
+        now = time.time()
+        interval = RELOAD_INTERVAL if self.subscription.live else POLL_INTERVAL
+        waits = [interval, self.scheduler.seconds_until_next(now)]
+        retry_at = self.outbox.next_attempt()
+        if retry_at is not None:
+            waits.append(retry_at - now)
+        return max(1, min(wait for wait in waits if wait is not None))
+
+    async def wait_for_change(self, timeout):
+        """Sleep up to `timeout` seconds, waking early on a change notification."""
+        fd = self.subscription.fileno()
+        if fd is None:
+            await asyncio.sleep(timeout)
+            return None
+
+        loop = asyncio.get_running_loop()
+        notified = asyncio.Event()
+        loop.add_reader(fd, notified.set)
+        try:
+            await asyncio.wait_for(notified.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+        return merge_changes(self.subscription.drain())
+
+    def import_discord_log(self, path=DISCORD_SENT_LOG_PATH):
+        """Carry the keys of discord_notifier.py's sent log into the shared store, once."""
+        if "discord" not in self.channels or not os.path.exists(path):
+            return
+        legacy = AppendOnlySentLog(path).load(time.time())
+        legacy.close()
+        keys = list(legacy.expires)
+        self.store.import_keys(keys)
+        self.sent.update(keys)
+        os.replace(path, f"{path}.imported")
+        log.info("Imported Discord sent log", extra={"keys": len(keys), "path": path})
+
+    async def run(self):
+        self.sent = await asyncio.to_thread(self.store.load)
+        await asyncio.to_thread(self.import_discord_log)
+        await asyncio.to_thread(self.outbox.purge)
+        self.scheduler.processed_at = await asyncio.to_thread(self.checkpoint.load)
+        if self.scheduler.processed_at is not None:
+            log.info("Catching up", extra={"since": time.ctime(self.scheduler.processed_at)})
+        # subscribe before the first load so no import falls in between
+        self.subscription = await asyncio.to_thread(self.feed.subscribe)
+        await asyncio.gather(*(channel.start() for channel in self.channels.values()))
+        log.info("Reminder service started", extra={"channels": ",".join(self.channels)})
+
+        try:
+            change = None
+            while True:
+                await self.tick(change)
+                change = await self.wait_for_change(
+                    await asyncio.to_thread(self.seconds_until_next_tick)
+                )
+        finally:
+            for channel in self.channels.values():
+                await channel.close()
+            await asyncio.to_thread(self.store.close)
+            self.subscription.close()
+
+
+def build_service():
+    load_dotenv()
+
+    storage = open_storage()
+    storage.ensure_schema()
+
+    channels = []
+    if os.getenv("SENDER_EMAIL") and os.getenv("SENDER_PASS"):
+        channels.append(EmailChannel(os.getenv("SENDER_EMAIL"), os.getenv("SENDER_PASS")))
+    if os.getenv("DISCORD_TOKEN"):
+        channels.append(DiscordChannel(os.getenv("DISCORD_TOKEN")))
+    if not channels:
+        raise RuntimeError("❌ No channels configured (set SENDER_EMAIL/SENDER_PASS and/or DISCORD_TOKEN)")
+    return ReminderService(storage, channels)
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+if __name__ == "__main__":
+    configure_logging()
+    start_exporter()
+    asyncio.run(build_service().run())
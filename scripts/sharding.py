@@ -0,0 +1,57 @@
+import os
+
+from dedup import digest
+
+# ============================================================
+# SHARDED EMAIL WORKERS
+# ============================================================
+# Several email workers (processes or hosts) split the reminder load:
+# each worker only schedules rows whose recipient (or cohort) hashes
+# to its shard, so N workers do 1/N of the work.
+#
+# Delivery itself goes through the outbox (see outbox.py): a reminder
+# key is enqueued once and leased to one worker at a time, so
+# replicas of the same shard, or workers started with mismatched
+# shard settings, never double-send.
+#
+#   python mail_scheduler.py --shard 0 --shards 4
+#
+# Defaults come from EMAIL_SHARD / EMAIL_SHARDS / EMAIL_SHARD_BY.
+
+SHARD_KEYS = {
+    "recipient": lambda row: str(row["student_email"]).strip().lower(),
+    "cohort": lambda row: "|".join(
+        str(row[c]).strip().lower() for c in ("course", "batch_name", "year", "mode")
+    ),
+}
+
+
+def shard_of(value, shards):
+    """Stable shard number for a string (same on every host and run)."""
+    return digest(value) % shards
+
+
+class Shard:
+    def __init__(self, index=0, count=1, by="recipient"):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"❌ Invalid shard {index} of {count}")
+        if by not in SHARD_KEYS:
+            raise ValueError(f"❌ Unknown shard key {by!r} (use {', '.join(SHARD_KEYS)})")
+        self.index = index
+        self.count = count
+        self.by = by
+        self._key = SHARD_KEYS[by]
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            int(os.getenv("EMAIL_SHARD", "0")),
+            int(os.getenv("EMAIL_SHARDS", "1")),
+            os.getenv("EMAIL_SHARD_BY", "recipient"),
+        )
+
+    def owns(self, row):
+        return self.count == 1 or shard_of(self._key(row), self.count) == self.index
+
+    def __str__(self):
+        return f"shard {self.index + 1}/{self.count} by {self.by}"
@@ -0,0 +1,221 @@
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+from collections import namedtuple
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from metrics import SEND_SECONDS
+from templates import PreparedMessage, seven_bit
+
+# ============================================================
+# SMTP SETTINGS (OVERRIDABLE FOR LOCAL TESTING)
+# ============================================================
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") != "0"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_MAX_PER_SESSION = int(os.getenv("SMTP_MAX_PER_SESSION", "90"))
+SMTP_TIMEOUT = 30
+
+# Sessions idle longer than this get a NOOP before being reused
+NOOP_AFTER_IDLE = 20
+
+# Errors after which the session is thrown away and the message retried once.
+# SMTPException subclasses OSError, so protocol errors are checked first.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, socket.timeout, OSError)
+
+SendResult = namedtuple("SendResult", ["message", "ok", "error"])
+
+
+def build_message(sender, recipient, subject, body):
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg
+
+
+def message_for(sender, message):
+    """A PreparedMessage as-is, or a MIME message built from (recipient, subject, body)."""
+    if isinstance(message, PreparedMessage):
+        return message
+    recipient, subject, body = message
+    return build_message(sender, recipient, subject, body)
+
+
+# ============================================================
+# ONE AUTHENTICATED SESSION
+# ============================================================
+
+class SMTPSession:
+    def __init__(self, pool):
+        self.pool = pool
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def connect(self):
+        pool = self.pool
+        if pool.use_ssl:
+            server = smtplib.SMTP_SSL(pool.host, pool.port, timeout=pool.timeout)
+        else:
+            server = smtplib.SMTP(pool.host, pool.port, timeout=pool.timeout)
+        if pool.password:
+            server.login(pool.sender, pool.password)
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def is_usable(self):
+        if self.server is None:
+            return False
+        if self.sent >= self.pool.max_per_session:
+            return False
+        if time.monotonic() - self.last_used < NOOP_AFTER_IDLE:
+            return True
+        try:
+            code, _ = self.server.noop()
+        except OSError:
+            return False
+        return code == 250
+
+    def send(self, msg):
+        if isinstance(msg, PreparedMessage):
+            # Pre-encoded bytes with an 8bit UTF-8 body (see templates.py);
+            # servers without 8BITMIME get it as quoted-printable
+            if self.server.has_extn("8bitmime"):
+                self.server.sendmail(self.pool.sender, [msg.recipient], msg.data, ["BODY=8BITMIME"])
+            else:
+                self.server.sendmail(self.pool.sender, [msg.recipient], seven_bit(msg.data))
+        else:
+            self.server.send_message(msg)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+        self.server = None
+
+
+# ============================================================
+# CONNECTION POOL
+# ============================================================
+
+class SMTPPool:
+    """Keeps up to `size` logged-in SMTP sessions and reuses them across messages."""
+
+    def __init__(self, sender, password, host=SMTP_HOST, port=SMTP_PORT,
+                 use_ssl=SMTP_USE_SSL, size=SMTP_POOL_SIZE,
+                 max_per_session=SMTP_MAX_PER_SESSION, timeout=SMTP_TIMEOUT):
+        self.sender = sender
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.size = size
+        self.max_per_session = max_per_session
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.connects = 0
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._open < self.size:
+                self._open += 1
+                return SMTPSession(self)
+
+        return self._idle.get()
+
+    def _release(self, session):
+        self._idle.put(session)
+
+    def _ready(self, session):
+        if not session.is_usable():
+            session.close()
+            session.connect()
+            self.connects += 1
+
+    def _send_on(self, session, msg):
+        try:
+            self._ready(session)
+            session.send(msg)
+            return
+        except smtplib.SMTPServerDisconnected:
+            pass
+        except smtplib.SMTPResponseException as e:
+            # 421 = server is closing the channel, anything else is final
+            if e.smtp_code != 421:
+                raise
+        except smtplib.SMTPException:
+            raise
+        except RECONNECT_ERRORS:
+            pass
+
+        session.close()
+        self._ready(session)
+        session.send(msg)
+
+    def send(self, message):
+        """Send a PreparedMessage or a (recipient, subject, body) tuple."""
+        msg = message_for(self.sender, message)
+
+        session = self._acquire()
+        try:
+            with SEND_SECONDS.time(channel="email"):
+                self._send_on(session, msg)
+            return SendResult(message, True, None)
+        except Exception as e:
+            session.close()
+            return SendResult(message, False, e)
+        finally:
+            self._release(session)
+
+    def send_batch(self, messages):
+        """Send PreparedMessages or (recipient, subject, body) tuples, returning one SendResult each."""
+        results = []
+        session = self._acquire()
+        try:
+            for message in messages:
+                msg = message_for(self.sender, message)
+                try:
+                    with SEND_SECONDS.time(channel="email"):
+                        self._send_on(session, msg)
+                    results.append(SendResult(message, True, None))
+                except Exception as e:
+                    session.close()
+                    results.append(SendResult(message, False, e))
+        finally:
+            self._release(session)
+        return results
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()
+        with self._lock:
+            self._open = 0
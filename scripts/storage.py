@@ -0,0 +1,357 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+import pandas as pd
+
+# ============================================================
+# STORAGE
+# ============================================================
+# One way for every script to reach the reminders database,
+# whether it is the local SQLite file or Postgres (DATABASE_URL):
+#
+#   - SCHEMA is the single definition of the tables, rendered per
+#     dialect (SQLite migrations and Postgres both build from it)
+#   - SQL is written once in qmark style (?) and translated for
+#     psycopg2 (%s); translations are cached per statement
+#   - connections come from a per-process pool instead of a new
+#     connect() per call; SQLite connections keep a larger
+#     prepared-statement cache
+#
+# open_storage(target) picks the backend from the target string:
+# a postgres:// URL or a SQLite file path.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "database", "reminders.db")
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, "data")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+# Prepared statements kept per SQLite connection (sqlite3 default is 128)
+SQLITE_STATEMENT_CACHE = 256
+
+# ----------------------------------------------------------
+# Schema
+# ----------------------------------------------------------
+# Column types are written for SQLite; "id" and "epoch" are
+# rendered per dialect.
+
+SCHEMA = {
+    "students": [
+        ("student_id", "id"),
+        ("name", "TEXT NOT NULL"),
+        ("email", "TEXT NOT NULL"),
+        ("discord_id", "TEXT"),
+        ("course", "TEXT NOT NULL"),
+        ("batch_name", "TEXT"),
+        ("year", "INTEGER"),
+        ("mode", "TEXT"),
+    ],
+    "classes": [
+        ("class_id", "id"),
+        ("course", "TEXT NOT NULL"),
+        ("batch_name", "TEXT"),
+        ("year", "INTEGER"),
+        ("mode", "TEXT"),
+        ("session_name", "TEXT NOT NULL"),
+        ("date", "TEXT NOT NULL"),
+        ("time", "TEXT NOT NULL"),
+        ("starts_at_utc", "epoch"),
+    ],
+    "assignments": [
+        ("assignment_id", "id"),
+        ("course", "TEXT NOT NULL"),
+        ("batch_name", "TEXT"),
+        ("year", "INTEGER"),
+        ("mode", "TEXT"),
+        ("subject", "TEXT NOT NULL"),
+        ("due_date", "TEXT NOT NULL"),
+        ("starts_at_utc", "epoch"),
+    ],
+}
+
+INDEXES = [
+    (f"{table}_cohort_idx", table, ("course", "batch_name", "year", "mode"))
+    for table in ("students", "classes", "assignments")
+] + [
+    (f"{table}_starts_at_idx", table, ("starts_at_utc",))
+    for table in ("classes", "assignments")
+] + [
+    # the recipients join matches cohorts case- and whitespace-insensitively
+    ("students_cohort_norm_idx", "students",
+     ("lower(trim(course))", "upper(trim(batch_name))", "year", "lower(trim(mode))")),
+]
+
+TYPES = {
+    "sqlite": {"id": "INTEGER PRIMARY KEY AUTOINCREMENT", "epoch": "INTEGER"},
+    "postgres": {"id": "SERIAL PRIMARY KEY", "epoch": "BIGINT"},
+}
+
+
+def column_type(kind, dialect):
+    return TYPES[dialect].get(kind, kind)
+
+
+def create_table_sql(table, dialect):
+    columns = ",\n".join(
+        f"    {name} {column_type(kind, dialect)}" for name, kind in SCHEMA[table]
+    )
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n{columns}\n)"
+
+
+def create_index_sql(name, table, columns):
+    return f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+
+
+# ----------------------------------------------------------
+# Paramstyle translation
+# ----------------------------------------------------------
+
+_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+
+@lru_cache(maxsize=512)
+def qmark_to_format(sql):
+    """Rewrite ? placeholders as %s (and escape literal %) outside string literals."""
+    parts = _LITERAL.split(sql)
+    for i, part in enumerate(parts):
+        part = part.replace("%", "%%")
+        parts[i] = part if i % 2 else part.replace("?", "%s")
+    return "".join(parts)
+
+
+# ----------------------------------------------------------
+# Connections
+# ----------------------------------------------------------
+
+class Connection:
+    """A pooled connection that speaks qmark SQL on either backend.
+
+    `with conn:` is a transaction (commit, or rollback on error) and
+    close() hands the connection back to the pool.
+    """
+
+    def __init__(self, storage, raw):
+        self.storage = storage
+        self.raw = raw
+
+    def execute(self, sql, params=()):
+        cur = self.raw.cursor()
+        cur.execute(self.storage.sql(sql), params)
+        return cur
+
+    def executemany(self, sql, rows):
+        cur = self.raw.cursor()
+        self.storage.executemany(cur, self.storage.sql(sql), rows)
+        return cur
+
+    def read_frame(self, sql, params=()):
+        return pd.read_sql_query(self.storage.sql(sql), self.raw, params=params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.raw.commit()
+        else:
+            self.raw.rollback()
+        return False
+
+    def close(self):
+        if self.raw is not None:
+            self.storage.release(self.raw)
+            self.raw = None
+
+
+class Storage(ABC):
+    dialect = None
+
+    # --- backend hooks -------------------------------------------------
+
+    @abstractmethod
+    def acquire(self):
+        ...
+
+    @abstractmethod
+    def release(self, raw):
+        ...
+
+    def sql(self, sql):
+        return sql
+
+    def executemany(self, cursor, sql, rows):
+        cursor.executemany(sql, rows)
+
+    @abstractmethod
+    def ensure_schema(self):
+        ...
+
+    def close(self):
+        pass
+
+    # --- public API ------------------------------------------------------
+
+    def connection(self):
+        return Connection(self, self.acquire())
+
+    def read_frame(self, sql, params=()):
+        conn = self.connection()
+        try:
+            return conn.read_frame(sql, params)
+        finally:
+            conn.close()
+
+
+# ============================================================
+# SQLITE
+# ============================================================
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),        # KiB, i.e. ~16 MB of page cache
+    ("mmap_size", 256 * 1024 * 1024),
+    ("busy_timeout", 5000),        # ms to wait for the writer lock
+)
+
+
+def configure(conn):
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class SQLiteStorage(Storage):
+    dialect = "sqlite"
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def dedicated(self):
+        """A configured connection outside the pool, for long-lived readers."""
+        return configure(sqlite3.connect(
+            self.path, check_same_thread=False, cached_statements=SQLITE_STATEMENT_CACHE
+        ))
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return self.dedicated()
+
+    def release(self, raw):
+        if raw.in_transaction:
+            raw.rollback()
+        try:
+            self._idle.put_nowait(raw)
+        except queue.Full:
+            raw.close()
+
+    def ensure_schema(self):
+        from migrations import migrate
+
+        raw = self.acquire()
+        try:
+            migrate(raw)
+        finally:
+            self.release(raw)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ============================================================
+# POSTGRESQL
+# ============================================================
+
+class PostgresStorage(Storage):
+    dialect = "postgres"
+
+    def __init__(self, database_url, minconn=1, maxconn=POOL_SIZE * 2):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.database_url = database_url
+        self.pool = ThreadedConnectionPool(minconn, maxconn, database_url)
+
+    def acquire(self):
+        return self.pool.getconn()
+
+    def release(self, raw):
+        if not raw.closed:
+            raw.rollback()
+        self.pool.putconn(raw)
+
+    def sql(self, sql):
+        return qmark_to_format(sql)
+
+    def executemany(self, cursor, sql, rows):
+        from psycopg2.extras import execute_batch
+
+        execute_batch(cursor, sql, rows, page_size=1000)
+
+    def ensure_schema(self):
+        from db_cache import install_postgres_version_triggers
+
+        conn = self.connection()
+        try:
+            with conn:
+                for table in SCHEMA:
+                    conn.execute(create_table_sql(table, self.dialect))
+                    # the only columns added after the original tables
+                    for name, kind in SCHEMA[table]:
+                        if kind == "epoch":
+                            conn.execute(
+                                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                                f"{name} {column_type(kind, self.dialect)}"
+                            )
+                for index in INDEXES:
+                    conn.execute(create_index_sql(*index))
+                install_postgres_version_triggers(conn.raw)
+        finally:
+            conn.close()
+
+    def close(self):
+        self.pool.closeall()
+
+
+# ============================================================
+# FACTORY
+# ============================================================
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def open_storage(target=None):
+    """Shared Storage for a postgres:// URL or SQLite path (default: DATABASE_URL, DB_PATH, then database/reminders.db)."""
+    if target is None:
+        target = os.getenv("DATABASE_URL") or os.getenv("DB_PATH") or DEFAULT_DB_PATH
+
+    with _storages_lock:
+        storage = _storages.get(target)
+        if storage is None:
+            if target.startswith(("postgres://", "postgresql://")):
+                storage = PostgresStorage(target)
+            else:
+                storage = SQLiteStorage(target)
+            _storages[target] = storage
+        return storage
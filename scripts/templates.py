@@ -0,0 +1,168 @@
+import email
+import html
+import os
+import time
+import uuid
+from collections import namedtuple
+from email import charset, policy
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+from string import Formatter
+
+# ============================================================
+# COMPILED TEMPLATES + PRE-ENCODED MIME
+# ============================================================
+# Reminder emails differ per recipient only in the address and the
+# name in the greeting; everything else is shared by every student
+# of a cohort. So:
+#
+#   - Template splits a str.format-style source into literal and
+#     field pieces once; rendering is a join, no parsing
+#   - each encoded piece (subject header, a rendered section as
+#     CRLF UTF-8 text or as HTML) is cached by its text, so it is
+#     encoded once per event rather than once per recipient
+#   - MimeLayout holds the multipart/alternative skeleton as bytes;
+#     a message is those bytes joined with the recipient's pieces,
+#     sent as-is with sendmail() - no email.mime objects per message
+#
+# Bodies are sent as 8bit UTF-8 when the server has the 8BITMIME
+# extension; otherwise smtp_pool.SMTPSession.send re-encodes the
+# message with seven_bit(). Header values from the sheets (address,
+# subject) have CR/LF removed so they cannot add header lines.
+
+EMAIL_HTML = os.getenv("EMAIL_HTML", "1") != "0"
+
+# Encoded pieces kept per text (sections, subjects)
+ENCODE_CACHE = 16384
+
+PreparedMessage = namedtuple("PreparedMessage", ["recipient", "subject", "data"])
+
+
+class Template:
+    """A str.format-style template, parsed once."""
+
+    def __init__(self, source):
+        self.source = source
+        self.literals = []
+        self.fields = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if spec or conversion:
+                raise ValueError(f"❌ Format specs are not supported in templates: {source!r}")
+            self.literals.append(literal)
+            if field is not None:
+                self.fields.append(field)
+        if len(self.literals) == len(self.fields):
+            self.literals.append("")
+
+    def render(self, values):
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(str(values[field]))
+            parts.append(literal)
+        return "".join(parts)
+
+    def __call__(self, **values):
+        return self.render(values)
+
+
+# ------------------------------------------------------------
+# Cached encoders
+# ------------------------------------------------------------
+
+def encode_text(text):
+    return text.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+
+
+def encode_html(text):
+    return html.escape(text).replace("\r\n", "\n").replace("\n", "<br>\r\n").encode("utf-8")
+
+
+# Shared pieces (subjects, rendered sections) go through these; one-off
+# pieces such as a greeting use encode_text / encode_html directly
+text_bytes = lru_cache(maxsize=ENCODE_CACHE)(encode_text)
+html_bytes = lru_cache(maxsize=ENCODE_CACHE)(encode_html)
+
+
+def one_line(value):
+    """A header value with CR/LF removed, so it cannot start another header."""
+    return value.replace("\r", "").replace("\n", "")
+
+
+@lru_cache(maxsize=ENCODE_CACHE)
+def subject_header(subject):
+    subject = subject.replace("\r", "").replace("\n", " ")
+    if subject.isascii():
+        return subject.encode("ascii")
+    return Header(subject, "utf-8").encode(linesep="\r\n").encode("ascii")
+
+
+# formatdate() costs more than the rest of a message; one per second
+@lru_cache(maxsize=4)
+def date_header(second):
+    return formatdate(second, usegmt=True).encode("ascii")
+
+
+# ------------------------------------------------------------
+# MIME skeleton
+# ------------------------------------------------------------
+
+class MimeLayout:
+    """multipart/alternative (plain text, optional HTML) from one sender, as pre-encoded bytes."""
+
+    def __init__(self, sender, html=EMAIL_HTML):
+        boundary = f"=_reminder_{uuid.uuid4().hex}"
+        self.html = html
+        self.domain = sender.rpartition("@")[2] or "localhost"
+        self.head = (
+            f"From: {sender}\r\n"
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+            "\r\n"
+        ).encode("ascii")
+        self.text_head = self._part_head(boundary, "text/plain")
+        self.html_head = self._part_head(boundary, "text/html")
+        self.tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+
+    @staticmethod
+    def _part_head(boundary, content_type):
+        return (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}; charset=\"utf-8\"\r\n"
+            "Content-Transfer-Encoding: 8bit\r\n"
+            "\r\n"
+        ).encode("ascii")
+
+    def message(self, recipient, subject, text_chunks, html_chunks=()):
+        """Join pre-encoded body chunks into one message ready for sendmail()."""
+        recipient = one_line(recipient)
+        parts = [
+            b"To: ", recipient.encode("utf-8"), b"\r\nSubject: ", subject_header(subject),
+            b"\r\nDate: ", date_header(int(time.time())),
+            b"\r\nMessage-ID: ", make_msgid(domain=self.domain).encode("ascii"), b"\r\n",
+            self.head, self.text_head, *text_chunks,
+        ]
+        if self.html:
+            parts += [b"\r\n", self.html_head, b"<html><body>\r\n", *html_chunks, b"\r\n</body></html>"]
+        parts.append(self.tail)
+        return PreparedMessage(recipient, subject, b"".join(parts))
+
+
+# ------------------------------------------------------------
+# 7bit fallback
+# ------------------------------------------------------------
+
+QP_UTF8 = charset.Charset("utf-8")
+QP_UTF8.body_encoding = charset.QP
+
+
+def seven_bit(data):
+    """A message from MimeLayout.message() with its 8bit parts re-encoded as quoted-printable."""
+    msg = email.message_from_bytes(data, policy=policy.compat32)
+    for part in msg.walk():
+        if part.is_multipart() or part.get("Content-Transfer-Encoding", "").lower() != "8bit":
+            continue
+        body = part.get_payload(decode=True).decode("utf-8")
+        del part["Content-Transfer-Encoding"]
+        part.set_payload(body, QP_UTF8)
+    return msg.as_bytes(policy=policy.compat32.clone(linesep="\r\n"))